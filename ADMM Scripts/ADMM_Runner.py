@@ -0,0 +1,498 @@
+import os
+import time
+import inspect
+import importlib
+import multiprocessing
+from traceback import format_exc
+import numpy as np
+
+
+def deviceSpec(device):
+    """Returns a picklable spec from which a worker process builds the same device again"""
+    cls = type(device)
+    parameters = inspect.signature(cls.__init__).parameters
+    kwargs = {name: getattr(device, name) for name in parameters if name != 'self' and hasattr(device, name)}
+    return {'module': cls.__module__, 'class': cls.__qualname__, 'kwargs': kwargs, 'rho': device.rho, 'matrixAPI': device.matrixAPI}
+
+
+def buildDevice(spec):
+    """Builds the device of a spec created by deviceSpec"""
+    module = importlib.import_module(spec['module'])
+    device = getattr(module, spec['class'])(**spec['kwargs'])
+    if spec['matrixAPI']:
+        module.useMatrixAPI([device])
+    device.rho = spec['rho']
+    return device
+
+
+def solveDevice(device, rhos, penalties, structured=True):
+    """Solves the nodal problem of the device for the rho and penalty term of its connections, returns the power per connection
+
+    Devices with a structuredUpdate use the banded QP solver, Gurobi solves their model when it fails.
+    """
+    for connection, rho, penalty in zip(device.Econnections, rhos, penalties):
+        connection.rho = rho
+        connection._penalty_term = penalty
+    if structured and hasattr(device, 'structuredUpdate'):
+        try:
+            return device.structuredUpdate()
+        except (RuntimeError, np.linalg.LinAlgError):
+            pass
+    if hasattr(device, '_updateObjective'):
+        device._updateObjective()
+    device.optimize()
+    return [np.array(device.model.getAttr('X', list(connection.powerVariables.values()))) for connection in device.Econnections]
+
+
+def _workerLoop(pipe, specs, threads, structured):
+    """Builds the devices of the worker once and solves them for every message until None is received
+
+    A message maps the device key to (rhos, penalties), the answer maps it to the power per connection.
+    """
+    try:
+        devices = {}
+        for key, spec in specs.items():
+            devices[key] = buildDevice(spec)
+            devices[key].model.setParam('Threads', threads)
+        pipe.send(('ready', None))
+    except Exception:
+        pipe.send(('error', format_exc()))
+        return
+
+    while True:
+        message = pipe.recv()
+        if message is None:
+            break
+        try:
+            results = {key: solveDevice(devices[key], rhos, penalties, structured) for key, (rhos, penalties) in message.items()}
+            pipe.send(('ok', results))
+        except Exception:
+            pipe.send(('error', format_exc()))
+    pipe.close()
+
+
+def partitionDevices(sizes, workers):
+    """Assigns the devices to the workers, largest first to the least loaded worker"""
+    loads = [0] * workers
+    parts = [[] for _ in range(workers)]
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        w = loads.index(min(loads))
+        parts[w].append(i)
+        loads[w] += sizes[i]
+    return parts
+
+
+def benchmarkProximal(devices, iterations=10, seed=0):
+    """Times the closed-form proximal update against the Gurobi solve of the same nodal problem
+
+    Both paths are solved for the same random penalty terms, the penalty terms of the devices are restored afterwards.
+
+    Returns:
+        list: Per device its name, the mean time per iteration of both paths, the speedup and the largest difference in power
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for device in devices:
+        if not hasattr(device, 'proximalUpdate'):
+            continue
+        saved = [c.penaltyTerm for c in device.Econnections]
+        closed_form_time, gurobi_time, difference = 0.0, 0.0, 0.0
+        for _ in range(iterations):
+            for connection in device.Econnections:
+                connection._penalty_term = rng.normal(0, 10, len(device.T)).tolist()
+            start = time.perf_counter()
+            powers = device.proximalUpdate()
+            closed_form_time += time.perf_counter() - start
+            start = time.perf_counter()
+            solved = solveDevice(device, [c.rho for c in device.Econnections], [c.penaltyTerm for c in device.Econnections], structured=False)
+            gurobi_time += time.perf_counter() - start
+            difference = max(difference, max(float(np.max(np.abs(np.asarray(a) - np.asarray(b)))) for a, b in zip(powers, solved)))
+        for connection, penalty in zip(device.Econnections, saved):
+            connection._penalty_term = penalty
+        results.append({'device': device.name, 'closed_form': closed_form_time / iterations, 'gurobi': gurobi_time / iterations,
+                        'speedup': gurobi_time / max(closed_form_time, 1e-12), 'max_difference': difference})
+    return results
+
+def monolithicSolution(nets):
+    """Returns the prices and the power per connection of the solved monolithic model for ADMMRunner.warmStart
+
+    The networks are those of Non ADMM Scripts/Networks.py with their connections in the same order as in the ADMM
+    networks. The price of ADMM is the negated dual of the balance constraint sum(power) == 0.
+    """
+    prices = [-np.asarray(net.dualValues, dtype=np.float64) for net in nets]
+    powers = [np.array([net.model.getAttr('X', list(c.powerVariables.values())) for c in net.Econnections]) for net in nets]
+    return prices, powers
+
+#########################################################################################################################################
+
+class ADMMRunner:
+    """Runs the consensus ADMM loop of the Benchmark_ADMM notebook with the nodal problems solved in parallel
+
+    Every worker process builds its devices once from deviceSpec and keeps their models for the whole run. Per
+    iteration only rho and the penalty terms go to the workers and the power values come back, these are stored on
+    the connections of the devices in this process, so the networks update as in the sequential loop. Devices with a
+    proximalUpdate (loads, renewables, dissipation, external power and lines) are solved in closed form in this process.
+
+    The state of the networks can be checkpointed during run and resumed with loadCheckpoint, or warm started from
+    the prices of an earlier solution with warmStart.
+
+    Usage:
+        with ADMMRunner(devices, nets, workers=8) as runner:
+            runner.run(max_iter=1000, epsilon=0.1, checkpoint='admm.npz')
+
+    Args:
+        devices (list): Devices of the system, built in this process
+        nets (list): Networks of the system
+        workers (int): Number of worker processes, the devices are solved in this process when 0
+        threads (int): Gurobi Threads per device model in the workers
+        closed_form (bool): Uses proximalUpdate instead of Gurobi for the devices that have one
+        structured (bool): Uses structuredUpdate, the banded QP solver, for the devices that have one (Generator, Storage)
+        rho (float): Penalty parameter of all networks, the rho of the devices is used when None and adaptive is None
+        adaptive (str): Residual balancing of rho, 'global' for one rho for all networks, 'network' for a rho per network
+        mu (float): rho is changed when one residual is more than mu times the other
+        tau (float): Factor by which rho is increased or decreased
+        alpha (float): Relaxation parameter, alpha in (1, 2) over-relaxes the consensus and dual update
+        accelerated (bool): Nesterov extrapolation of the dual and consensus power, fast ADMM of Goldstein et al. (2014)
+        eta (float): The extrapolation restarts when the combined residual does not decrease by this factor
+
+    Attributes:
+        history (list): Iteration, maximum absolute balance, primal and dual residual, whether the residual criterion
+            is met, rho of every network, extrapolation factor and time of the closed-form updates, of the Gurobi solves
+            and of the whole iteration
+    """
+
+    def __init__(self, devices, nets, workers=None, threads=1, closed_form=True, structured=True, rho=None, adaptive=None,
+                 mu=10, tau=2, alpha=1.0, accelerated=False, eta=0.999):
+        """Initialize the runner and start the workers. """
+        self.devices = devices
+        self.nets = nets
+        self.connections = [c for net in nets for c in net.Econnections]
+        self.closed_form = closed_form
+        self.structured = structured
+        self._proximal = [i for i, d in enumerate(devices) if closed_form and hasattr(d, 'proximalUpdate')]
+        self._solved = [i for i in range(len(devices)) if i not in self._proximal]
+        self.workers = min(len(self._solved), workers if workers is not None else multiprocessing.cpu_count())
+        self.threads = threads
+        if adaptive not in (None, 'global', 'network'):
+            raise ValueError(f"Unknown adaptive mode {adaptive}")
+        self.adaptive = adaptive
+        self.mu = mu
+        self.tau = tau
+        if not 0 < alpha < 2:
+            raise ValueError(f"Relaxation parameter alpha must be in (0, 2), got {alpha}")
+        self.alpha = alpha
+        self.accelerated = accelerated
+        self.eta = eta
+        self._resetMomentum()
+        self._converged = False
+        self.eps_abs = 0.1
+        self.eps_rel = 1e-3
+        if rho is not None or adaptive is not None:
+            for net in nets:
+                net.setRho(net.rho if rho is None else rho)
+        self.iteration = 0
+        self.history = []
+        self._processes = []
+        self._pipes = []
+        self._parts = []
+        if self.workers > 0:
+            self._start()
+
+    def _resetMomentum(self):
+        self._momentum = 1.0
+        self._beta = 0.0
+        self._combined_residual = np.inf
+
+    def _start(self):
+        context = multiprocessing.get_context('spawn')
+        sizes = [self.devices[i].model.NumVars for i in self._solved]
+        self._parts = [[self._solved[j] for j in part] for part in partitionDevices(sizes, self.workers) if part]
+        for part in self._parts:
+            parent, child = context.Pipe()
+            specs = {i: deviceSpec(self.devices[i]) for i in part}
+            process = context.Process(target=_workerLoop, args=(child, specs, self.threads, self.structured), daemon=True)
+            process.start()
+            child.close()
+            self._processes.append(process)
+            self._pipes.append(parent)
+        for pipe in self._pipes:
+            self._receive(pipe)
+
+    def _receive(self, pipe):
+        status, payload = pipe.recv()
+        if status == 'error':
+            self.close()
+            raise RuntimeError(f"ADMM worker failed:\n{payload}")
+        return payload
+
+    def updateClosedForm(self):
+        """Solves the nodal problems that have a closed-form solution and stores the power values on the connections"""
+        for i in self._proximal:
+            for connection, values in zip(self.devices[i].Econnections, self.devices[i].proximalUpdate()):
+                connection.setPowerValues(values)
+
+    def solveDevices(self):
+        """Solves the other nodal problems with Gurobi and stores the power values on the connections"""
+        if not self._pipes:
+            for device in (self.devices[i] for i in self._solved):
+                powers = solveDevice(device, [c.rho for c in device.Econnections], [c.penaltyTerm for c in device.Econnections], self.structured)
+                for connection, values in zip(device.Econnections, powers):
+                    connection.setPowerValues(values)
+            return
+
+        for pipe, part in zip(self._pipes, self._parts):
+            pipe.send({i: ([c.rho for c in self.devices[i].Econnections], [c.penaltyTerm for c in self.devices[i].Econnections]) for i in part})
+        for pipe in self._pipes:
+            for i, powers in self._receive(pipe).items():
+                for connection, values in zip(self.devices[i].Econnections, powers):
+                    connection.setPowerValues(values)
+
+    def updateNetworks(self):
+        """Updates the balance, dual and consensus power of every network, adapts rho, extrapolates and updates the
+        penalty term of every connection
+
+        Returns:
+            list: (primal, dual) residual of every network
+        """
+        for net in self.nets:
+            net.updateBalance()
+            net.updateDual(self.alpha)
+            net.updateConsensus(self.alpha)
+        residuals = [net.residuals() for net in self.nets]
+        self._converged = all(p <= tp and d <= td for (p, d), (tp, td) in
+                              zip(residuals, (net.tolerances(self.eps_abs, self.eps_rel) for net in self.nets)))
+        changed = self.adaptRho(residuals) if self.adaptive is not None else False
+        if self.accelerated:
+            beta = self.momentum(residuals, restart=changed)
+            for net in self.nets:
+                net.accelerate(beta)
+        for net in self.nets:
+            net.updatePenalties()
+        return residuals
+
+    def momentum(self, residuals, restart=False):
+        """Returns the extrapolation factor of fast ADMM, 0 when the combined residual rho*r^2 + s^2/rho did not
+        decrease by eta (or rho changed) and the extrapolation restarts"""
+        combined = sum(net.rho * p ** 2 + d ** 2 / net.rho for net, (p, d) in zip(self.nets, residuals))
+        if restart or combined >= self.eta * self._combined_residual:
+            self._resetMomentum()
+            self._combined_residual = combined
+            return self._beta
+        momentum = (1 + np.sqrt(1 + 4 * self._momentum ** 2)) / 2
+        self._beta = (self._momentum - 1) / momentum
+        self._momentum = momentum
+        self._combined_residual = combined
+        return self._beta
+
+    def adaptRho(self, residuals):
+        """Residual balancing: increases rho when the primal residual is more than mu times the dual residual and
+        decreases it in the opposite case, globally or per network, returns whether rho changed"""
+        if self.adaptive == 'network':
+            groups = [[i] for i in range(len(self.nets))]
+        else:
+            groups = [list(range(len(self.nets)))]
+        changed = False
+        for group in groups:
+            primal = np.sqrt(sum(residuals[i][0] ** 2 for i in group))
+            dual = np.sqrt(sum(residuals[i][1] ** 2 for i in group))
+            if primal > self.mu * dual:
+                factor = self.tau
+            elif dual > self.mu * primal:
+                factor = 1 / self.tau
+            else:
+                continue
+            for i in group:
+                self.nets[i].setRho(self.nets[i].rho * factor)
+            changed = True
+        return changed
+
+    def step(self):
+        """Runs one ADMM iteration, returns the maximum absolute balance over all networks"""
+        start = time.perf_counter()
+        self.updateClosedForm()
+        closed_form_time = time.perf_counter() - start
+        self.solveDevices()
+        solve_time = time.perf_counter() - start - closed_form_time
+        residuals = self.updateNetworks()
+        residual = max(float(np.max(np.abs(net.balance))) for net in self.nets)
+        self.history.append({'iteration': self.iteration, 'residual': residual,
+                             'primal_residual': float(np.sqrt(sum(p ** 2 for p, _ in residuals))),
+                             'dual_residual': float(np.sqrt(sum(d ** 2 for _, d in residuals))),
+                             'converged': self._converged, 'rho': [net.rho for net in self.nets],
+                             'beta': self._beta, 'closed_form_time': closed_form_time,
+                             'solve_time': solve_time, 'time': time.perf_counter() - start})
+        self.iteration += 1
+        return residual
+
+    def saveCheckpoint(self, path):
+        """Writes the state of all networks, rho, the extrapolation state and the iteration to a compressed npz file
+
+        The file is written next to path first and then renamed, so an interrupted write keeps the previous checkpoint.
+        """
+        arrays = {'iteration': np.array(self.iteration), 'momentum': np.array([self._momentum, self._beta, self._combined_residual])}
+        for i, net in enumerate(self.nets):
+            for name, value in net.getState().items():
+                arrays[f"net{i}.{name}"] = value
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temporary, path)
+
+    def loadCheckpoint(self, path, resume=True):
+        """Loads a checkpoint of saveCheckpoint into the networks of the same system
+
+        Args:
+            resume (bool): Continues the run of the checkpoint with its iteration count and extrapolation, when False
+                the state is only used as warm start, e.g. from the run of a previous day with slightly changed inputs
+
+        Raises:
+            ValueError: When the checkpoint belongs to a system with other networks, connections or time steps
+        """
+        with np.load(path) as data:
+            states = [{} for _ in self.nets]
+            for key in data.files:
+                if key.startswith('net'):
+                    i, name = key[3:].split('.', 1)
+                    if int(i) >= len(states):
+                        raise ValueError(f"Checkpoint {path} has more networks than the system")
+                    states[int(i)][name] = data[key]
+            if any(not state for state in states):
+                raise ValueError(f"Checkpoint {path} has fewer networks than the system")
+            for net, state in zip(self.nets, states):
+                net.loadState(state, extrapolation=resume)
+            if resume:
+                self.iteration = int(data['iteration'])
+                self._momentum, self._beta, self._combined_residual = (float(v) for v in data['momentum'])
+            else:
+                self._resetMomentum()
+
+    def warmStart(self, prices, powers=None):
+        """Starts from the prices, and optionally the power per connection, of every network, e.g. from monolithicSolution"""
+        for i, net in enumerate(self.nets):
+            net.warmStart(prices[i], None if powers is None else powers[i])
+        self._resetMomentum()
+
+    def run(self, max_iter=1000, epsilon=0.1, stopping='balance', eps_rel=1e-3, checkpoint=None, checkpoint_every=10, verbose=False):
+        """Iterates until convergence, returns True on convergence
+
+        Args:
+            epsilon (float): Tolerance on the balance, or the absolute tolerance of the residual criterion
+            stopping (str): 'balance' stops when the balance of every network is below epsilon in every time step,
+                'residuals' when the primal and dual residual of every network are below their tolerance
+            eps_rel (float): Relative tolerance of the residual criterion
+            checkpoint (str): Path of the checkpoint file, written every checkpoint_every iterations and at the end
+        """
+        if stopping not in ('balance', 'residuals'):
+            raise ValueError(f"Unknown stopping criterion {stopping}")
+        self.eps_abs = epsilon
+        self.eps_rel = eps_rel
+        converged = False
+        for _ in range(max_iter):
+            residual = self.step()
+            if checkpoint is not None and self.iteration % checkpoint_every == 0:
+                self.saveCheckpoint(checkpoint)
+            if verbose:
+                entry = self.history[-1]
+                print(f"Iteration {self.iteration - 1}: balance {residual:.6f}, primal {entry['primal_residual']:.6f}, "
+                      f"dual {entry['dual_residual']:.6f}")
+            converged = (residual < epsilon) if stopping == 'balance' else self._converged
+            if converged:
+                if verbose:
+                    print(f"CONVERGENCE in iteration {self.iteration - 1}")
+                break
+        if checkpoint is not None:
+            self.saveCheckpoint(checkpoint)
+        return converged
+
+    def close(self):
+        """Stops the workers"""
+        for pipe in self._pipes:
+            try:
+                pipe.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._pipes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+#########################################################################################################################################
+
+VARIANTS = {
+    'standard': {},
+    'relaxed': {'alpha': 1.6},
+    'accelerated': {'accelerated': True},
+    'adaptive': {'adaptive': 'global'},
+    'relaxed adaptive': {'alpha': 1.6, 'adaptive': 'global'},
+}
+
+
+def benchmarkVariants(devices, nets, variants=None, max_iter=1000, epsilon=0.1, stopping='residuals', eps_rel=1e-3, workers=0, **kwargs):
+    """Runs ADMMRunner for every variant on the same system and returns the iterations to tolerance of each
+
+    The networks are reset before every variant, so every run starts from zero duals and power.
+
+    Args:
+        variants (dict): Name and ADMMRunner keyword arguments of every variant, VARIANTS when None
+        kwargs: Further ADMMRunner keyword arguments shared by all variants
+
+    Returns:
+        list: Per variant its name, whether and in how many iterations it converged, the run time, the final balance,
+            primal and dual residual, the final rho and the mean price of every network
+    """
+    results = []
+    for name, options in (VARIANTS if variants is None else variants).items():
+        for net in nets:
+            net.reset()
+        start = time.perf_counter()
+        with ADMMRunner(devices, nets, workers=workers, **kwargs, **options) as runner:
+            converged = runner.run(max_iter=max_iter, epsilon=epsilon, stopping=stopping, eps_rel=eps_rel)
+        last = runner.history[-1]
+        results.append({'variant': name, 'converged': converged, 'iterations': runner.iteration, 'time': time.perf_counter() - start,
+                        'residual': last['residual'], 'primal_residual': last['primal_residual'], 'dual_residual': last['dual_residual'],
+                        'rho': last['rho'], 'prices': [float(np.mean(net.prices)) for net in nets]})
+    return results
+
+
+def benchmarkWorkers(devices, nets, workers=(0, 1, 2, 4), iterations=20, **kwargs):
+    """Runs the same number of ADMM iterations for every worker count and times each iteration from the history
+
+    The networks are reset before every run and no stopping rule applies, so every run does the same work. The first
+    iteration is left out of the mean, it includes the first solve of every device model.
+
+    Args:
+        workers (list): Worker counts to compare, 0 solves the devices in this process
+        kwargs: Further ADMMRunner keyword arguments shared by all runs
+
+    Returns:
+        list: Per worker count the number of workers the runner used, the start-up time, the mean and median time per
+            iteration and per device solve step, the speedup of the mean iteration over the first entry and the
+            number of cores of this machine
+    """
+    results = []
+    for count in workers:
+        for net in nets:
+            net.reset()
+        start = time.perf_counter()
+        with ADMMRunner(devices, nets, workers=count, **kwargs) as runner:
+            startup = time.perf_counter() - start
+            for _ in range(iterations):
+                runner.step()
+        times = np.array([entry['time'] for entry in runner.history[1:]])
+        solve_times = np.array([entry['solve_time'] for entry in runner.history[1:]])
+        results.append({'workers': runner.workers, 'startup': startup, 'iteration': float(np.mean(times)),
+                        'median_iteration': float(np.median(times)), 'solve': float(np.mean(solve_times)),
+                        'cores': multiprocessing.cpu_count()})
+    for result in results:
+        result['speedup'] = results[0]['iteration'] / result['iteration']
+    return results
+
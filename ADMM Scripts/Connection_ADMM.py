@@ -1,3 +1,6 @@
+import numpy as np
+import gurobipy as gp
+
 class EConnection:
     """A class that represent the flow from a node to a line
 
@@ -13,20 +16,34 @@ class EConnection:
         self.name = "Electric Connection" if name is None else name
         self.network = None 
         self.device = None
+        # Penalty parameter of this connection, the rho of the device is used when None
+        self.rho = None
 
     def _init_problem(self, model, time_horizon):
         """Initialize the variables beloinging to the line class that are importatn for the optimization model. """
         self._power = model.addVars(time_horizon,lb = -100, name=f"{self.name}_Variable")
         # Update the model to integrate the new variable
-        self._prevPower = [0]*time_horizon
-        self._penalty_term = [0]*time_horizon
-
+        self._prevPower = np.zeros(time_horizon)
+        self._penalty_term = np.zeros(time_horizon)
+        self._values = None
+        self._power_row = None
+
+    def setState(self, power, prev_power, penalty):
+        """Moves the ADMM state of the connection into rows of the arrays of its network, the connection keeps views"""
+        prev_power[:] = self._prevPower
+        penalty[:] = self._penalty_term
+        if self._values is not None:
+            power[:] = self._values
+            self._values = power
+        self._power_row = power
+        self._prevPower = prev_power
+        self._penalty_term = penalty
 
     def updatePenalty(self):
         """Updates the penalty term for the terminal, used in the optimization model"""
         duals = self.network.dual
         average = self.network.balance
-        self._penalty_term  =[x - y - z for x, y, z in zip(self._prevPower, average, duals)]
+        self._penalty_term[:] = self._prevPower - average - duals
 
     @property
     def powerVariables(self):
@@ -34,27 +51,52 @@ class EConnection:
         terminal."""
         return self._power
     
+    @property
+    def powerMVar(self):
+        """Power variables of this terminal as a matrix variable, ordered in time"""
+        return gp.MVar.fromlist(list(self._power.values()))
+
     @property
     def powerValues(self):
         """Power send (positive value) or received (negative value) at this
         terminal."""
-        return [var.x for var in self._power.values()]
+        if self._values is not None:
+            return self._values
+        return np.array([var.x for var in self._power.values()])
+
+    @property
+    def storesValues(self):
+        """True when the power values were set with setPowerValues instead of solved in the model of the device"""
+        return self._values is not None
+
+    def setPowerValues(self, values):
+        """Stores power values solved outside this model, e.g. by a worker process, powerValues returns them from now on"""
+        if self._power_row is not None:
+            self._power_row[:] = values
+            self._values = self._power_row
+        else:
+            self._values = np.array(values, dtype=np.float64)
     
     @property
     def penaltyTerm(self):
         return self._penalty_term
     
+    @property
+    def penaltyRho(self):
+        """Penalty parameter this connection uses, its own rho or the rho of its device"""
+        return self.device.rho if self.rho is None else self.rho
+    
     @property
     def prevPower(self):
         return self._prevPower
     
     def getTotalPayment(self):
         """Method to get the weighted sum of values using the coefficients from C"""
-        return sum(p * marginal_cost for p, marginal_cost in zip(self.powerValues, self.network.dual))
+        return float(self.powerValues @ self.network.dual)
 
     def getHourlyPayment(self):
         """Method to get the weighted sum of values using the coefficients from C"""
-        return [p * marginal_cost for p, marginal_cost in zip(self.powerValues, self.network.dual)]
+        return self.powerValues * self.network.dual
     
 
     def set_network(self, network):
@@ -69,7 +111,7 @@ class EConnection:
     def set_prev_power(self):
         """Set the previous power equal to the current power valuesm, therefore saves the output of the optimizattion model, 
         and these values are in the next iteration used to calculate the pernalty term"""
-        self._prevPower = self.powerValues
+        self._prevPower[:] = self.powerValues
 
 
 #########################################################################################################################################
@@ -1,11 +1,59 @@
+import os
+import sys
 import numpy as np 
 import gurobipy as gp 
-import pandas as pd
+import scipy.sparse as sp
 from Connection import EConnection, HConnection
 from gurobipy import GRB
+# Both approaches read the profiles through the Profiles module of the non-ADMM scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'Non ADMM Scripts'))
+from Profiles import getProfile
+from Structured_Solvers import solveBandedQP
+
+
+def useMatrixAPI(devices, enabled=True):
+    """Selects the matrix API build path for these devices, each device rebuilds the constraints of its own model"""
+    for device in devices:
+        device.matrixAPI = enabled
+        device.model.update()
+        device.model.remove(device.model.getConstrs())
+        device.setConstraints()
+        device.model.update()
+
+
+def identityMatrix(n, scale=1):
+    """Sparse n x n identity matrix multiplied by scale"""
+    return scale * sp.identity(n, format='csr')
+
+
+def differenceMatrix(n, scale=1):
+    """Sparse (n-1) x n matrix of which row t-1 gives scale * (x[t] - x[t-1])"""
+    return scale * sp.diags([-np.ones(n - 1), np.ones(n - 1)], [0, 1], shape=(n - 1, n), format='csr')
+
+
+def recursionMatrix(n):
+    """Sparse n x n matrix with row 0 giving x[0] and row t giving x[t] - x[t-1]"""
+    return sp.diags([np.ones(n), -np.ones(n - 1)], [0, -1], shape=(n, n), format='csr')
+
+
+def initialMatrix(n, scale=1):
+    """Sparse 1 x n matrix that selects scale * x[0]"""
+    return sp.csr_matrix(([scale], ([0], [0])), shape=(1, n))
+
+
+# Lower bound of the connection variables, see EConnection._init_problem
+POWER_LB = -100
+
+
+def bound(value, default):
+    """value, or default when it is None, as float"""
+    return float(default if value is None else value)
 
 
 class Device:
+    # Build the constraints with the matrix API instead of one expression per time step, set per device through useMatrixAPI
+    matrixAPI = False
+
     def __init__(self, T, Econnections = None, Hconnections=None, name=None):
         self.name = type(self).__name__ if name is None else name
         self.Econnections = Econnections
@@ -14,6 +62,7 @@ class Device:
         self.model = gp.Model()
         self.model.setParam('OutputFlag', 0)
         self._cost = None
+        self._objective_rho = None
         if Econnections is not None: 
             for Econnection in Econnections:
                 Econnection._init_problem(self.model, len(T))
@@ -29,6 +78,42 @@ class Device:
         """Device objective, to be overriden by subclasses."""
         return self._cost
 
+    def _costExpression(self):
+        """Operational cost of the device without the penalty terms, to be overriden by subclasses"""
+        return gp.QuadExpr()
+
+    def connectionRho(self, i=0):
+        """Penalty parameter of connection i, the rho of the device unless the connection has its own"""
+        return self.Econnections[i].penaltyRho
+
+    def _setPenaltyObjective(self):
+        """Sets the cost of the device plus (rho/2)*(x[t] - penalty[t])^2 for the power variables of every connection
+
+        The quadratic part is built once per value of rho. Afterwards only the linear coefficients -rho*penalty[t] and
+        the constant (rho/2)*penalty[t]^2 change, set with one vectorized setAttr per iteration.
+        """
+        penalties = [np.asarray(c.penaltyTerm, dtype=np.float64) for c in self.Econnections]
+        penalty = np.concatenate(penalties)
+        rhos = tuple(self.connectionRho(i) for i in range(len(self.Econnections)))
+        rho = np.concatenate([np.full(len(p), r) for p, r in zip(penalties, rhos)])
+        if self._objective_rho != rhos:
+            self._penalty_vars = [var for c in self.Econnections for var in c.powerVariables.values()]
+            objective = gp.QuadExpr()
+            objective.add(self._costExpression())
+            objective.addTerms((rho / 2).tolist(), self._penalty_vars, self._penalty_vars)
+            self.model.setObjective(objective, GRB.MINIMIZE)
+            self.model.update()
+            self._base_obj = np.asarray(self.model.getAttr('Obj', self._penalty_vars), dtype=np.float64)
+            self._base_con = self.model.ObjCon
+            self._objective_rho = rhos
+
+        self.model.setAttr('Obj', self._penalty_vars, (self._base_obj - rho * penalty).tolist())
+        self.model.ObjCon = self._base_con + float((rho / 2) @ (penalty * penalty))
+
+    def _penaltyArray(self, i=0):
+        """Penalty term of connection i as an array"""
+        return np.asarray(self.Econnections[i].penaltyTerm, dtype=np.float64)
+
     def totalPayment(self):
         """Network optimization results. Print here the power output and the payment scheme"""
         total_sum = 0
@@ -88,24 +173,20 @@ class CHP(Device):
         self.setConstraints()
 
 
-    def _updateObjective(self):
+    def _costExpression(self):
         powerVar = self.Econnections[0].powerVariables
-        heatVar = self.Econnections[1].powerVariables
-
-        #set new variable, fuel burned for heat call it q
-        penaltyPar_1 = self.Econnections[0].penaltyTerm
-        penaltyPar_2 = self.Econnections[1].penaltyTerm
+        cost  = gp.quicksum(self.alpha * ((-powerVar[t] - self.operating_point) * (-powerVar[t] - self.operating_point)) - self.beta * powerVar[t] + self.gamma for t in self.T)          #+ self.beta_q * heatVar[t] + self.gamma_q  for t in self.T)
+        cost += gp.quicksum( -(self.beta/2) * self.boiler[t]  for t in self.T)  
+        return cost
 
-        self.objective  = gp.quicksum(self.alpha * ((-powerVar[t] - self.operating_point) * (-powerVar[t] - self.operating_point)) - self.beta * powerVar[t] + self.gamma for t in self.T)          #+ self.beta_q * heatVar[t] + self.gamma_q  for t in self.T)
-        self.objective += gp.quicksum( -(self.beta/2) * self.boiler[t]  for t in self.T)  
-        self.objective +=  gp.quicksum((self.rho/2)*((powerVar[t] - penaltyPar_1[t]) * (powerVar[t] - penaltyPar_1[t])) for t in self.T)
-        self.objective +=  gp.quicksum((self.rho/2)*((heatVar[t] - penaltyPar_2[t]) * (heatVar[t] - penaltyPar_2[t])) for t in self.T)
-
-        self.model.setObjective(self.model.getObjective() + self.objective, gp.GRB.MINIMIZE)
-        self.model.update()
+    def _updateObjective(self):
+        self._setPenaltyObjective()
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            self._setMatrixConstraints()
+            return
         powerVar = self.Econnections[0].powerVariables
         heatVar = self.Econnections[1].powerVariables
 
@@ -131,6 +212,34 @@ class CHP(Device):
 
         self.model.update()
 
+    def _setMatrixConstraints(self):
+        """Sets the same constraints as setConstraints through the matrix API"""
+        n = len(self.T)
+        power = list(self.Econnections[0].powerVariables.values())
+        heat = list(self.Econnections[1].powerVariables.values())
+        boiler = list(self.boiler.values())
+
+        self.model.addMConstr(sp.hstack([identityMatrix(n, -1), identityMatrix(n, -1/2)], format='csr'), power + boiler, GRB.LESS_EQUAL, np.full(n, self.power_max))
+
+        self.model.addMConstr(identityMatrix(n, -1), power, GRB.GREATER_EQUAL, np.full(n, self.power_min))
+        self.model.addMConstr(identityMatrix(n, -1), boiler, GRB.GREATER_EQUAL, np.full(n, self.power_min))
+
+        # With dissipation
+        self.model.addMConstr(sp.hstack([identityMatrix(n), identityMatrix(n, -1), identityMatrix(n, -1)], format='csr'), heat + power + boiler, GRB.EQUAL, np.zeros(n))
+
+        if self.ramp_max is not None: 
+            self.model.addMConstr(differenceMatrix(n, -1), power, GRB.LESS_EQUAL, np.full(n - 1, self.ramp_max))
+            self.model.addMConstr(differenceMatrix(n, -1/2), boiler, GRB.LESS_EQUAL, np.full(n - 1, self.ramp_max))
+
+        if self.ramp_min is not None:
+            self.model.addMConstr(differenceMatrix(n, -1), power, GRB.GREATER_EQUAL, np.full(n - 1, self.ramp_min))
+            self.model.addMConstr(differenceMatrix(n, -1/2), boiler, GRB.GREATER_EQUAL, np.full(n - 1, self.ramp_min))
+
+        if self.power_init is not None:
+            self.model.addMConstr(initialMatrix(n, -1), power, GRB.EQUAL, np.array([self.power_init]))
+
+        self.model.update()
+
     def setVariables(self):
         """Sets the Variables of the optimization model"""
         self.boiler = self.model.addVars(self.T, lb = -100)
@@ -185,16 +294,18 @@ class Generator(Device):
         self._updateObjective()
         self.setConstraints()
 
-    def _updateObjective(self):
+    def _costExpression(self):
         powerVar   = self.Econnections[0].powerVariables
-        penaltyPar = self.Econnections[0].penaltyTerm
-        objective  = gp.quicksum(self.alpha * ((-powerVar[t] - self.operating_point) * (-powerVar[t] - self.operating_point)) - self.beta * powerVar[t] + self.gamma for t in self.T)
-        objective +=  gp.quicksum((self.rho/2)*((powerVar[t] - penaltyPar[t]) * (powerVar[t] - penaltyPar[t])) for t in self.T)
-        self.model.setObjective(objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        return gp.quicksum(self.alpha * ((-powerVar[t] - self.operating_point) * (-powerVar[t] - self.operating_point)) - self.beta * powerVar[t] + self.gamma for t in self.T)
+
+    def _updateObjective(self):
+        self._setPenaltyObjective()
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            self._setMatrixConstraints()
+            return
         powerVar = self.Econnections[0].powerVariables
 
         self.model.addConstrs(-powerVar[t] <=  self.power_max for t in self.T)
@@ -207,6 +318,36 @@ class Generator(Device):
         if self.power_init is not None:
             self.model.addConstr(-powerVar[0] == self.power_init)  
 
+    def _setMatrixConstraints(self):
+        """Sets the same constraints as setConstraints through the matrix API"""
+        n = len(self.T)
+        power = list(self.Econnections[0].powerVariables.values())
+
+        self.model.addMConstr(identityMatrix(n, -1), power, GRB.LESS_EQUAL, np.full(n, self.power_max))
+        self.model.addMConstr(identityMatrix(n, -1), power, GRB.GREATER_EQUAL, np.full(n, self.power_min))
+
+        if self.ramp_max is not None: 
+            self.model.addMConstr(differenceMatrix(n, -1), power, GRB.LESS_EQUAL, np.full(n - 1, self.ramp_max))
+        if self.ramp_min is not None:
+            self.model.addMConstr(differenceMatrix(n, -1), power, GRB.GREATER_EQUAL, np.full(n - 1, self.ramp_min))
+        if self.power_init is not None:
+            self.model.addMConstr(initialMatrix(n, -1), power, GRB.EQUAL, np.array([self.power_init]))
+
+    def structuredUpdate(self):
+        """Solves the nodal problem with the banded QP solver, the ramp limits couple only consecutive time steps"""
+        n = len(self.T)
+        penalty = self._penaltyArray()
+        rho = self.connectionRho()
+        diagonal = np.full(n, 2 * self.alpha + rho)
+        c = 2 * self.alpha * self.operating_point - self.beta - rho * penalty
+        lb = np.full(n, max(-bound(self.power_max, np.inf), POWER_LB))
+        ub = np.full(n, -bound(self.power_min, -np.inf))
+        # ramp_min <= power[t-1] - power[t] <= ramp_max
+        d_lb = np.full(n - 1, -bound(self.ramp_max, np.inf))
+        d_ub = np.full(n - 1, -bound(self.ramp_min, -np.inf))
+        first = None if self.power_init is None else -self.power_init
+        return [solveBandedQP(diagonal, np.zeros(n - 1), c, lb, ub, d_lb, d_ub, first=first)]
+
     def setVariables(self):
         """Sets the Variables of the optimization model"""
         pass
@@ -255,26 +396,29 @@ class Renewable(Device):
     #     self.model.update()
 
     def determinePowerGeneration(self):
-        df = pd.read_excel('Renewable_potential.xlsx')
         if self.technology == 'Wind':
             column_name = 'Wind_potential'
         elif self.technology == 'PV':
             column_name  = 'PV_potential'
         else:
             print("No valid technology")
-        normalized_power_potential = df[column_name].tolist()
+        normalized_power_potential = getProfile('Renewable_potential.xlsx', column_name, self.T)
         # Calculate real power based on normalized load profile and annual power demand
-        real_power = [x * self.install_cap for x in normalized_power_potential]
+        real_power = np.asarray(normalized_power_potential, dtype=np.float64) * self.install_cap
         return real_power
     
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
+        powerVar = list(self.Econnections[0].powerVariables.values())
 
         # With Power Dissipation
-        self.model.addConstrs(-powerVar[t] ==  self.power_available[t] for t in self.T)
+        self.model.addMConstr(identityMatrix(len(self.T), -1), powerVar, GRB.EQUAL, self.power_available[self.T])
         
 
+    def proximalUpdate(self):
+        """Closed-form solution of the nodal problem, the power is fixed by the available generation"""
+        return [-self.power_available[self.T]]
+
     def optimize(self):
         self.model.optimize()
 
@@ -293,21 +437,24 @@ class FixedLoad(Device):
         self.buildingType = buildingType
         self.annualDemand = annualDemand
         self.power = self.determineLoadProfile()
-        assert all(item > 0 for item in self.power)
+        assert np.all(self.power > 0)
         self.setConstraints()
 
     def determineLoadProfile(self):
-        df = pd.read_excel('load_profiles_normalized.xlsx')
-        normalized_power = df[self.buildingType].tolist()
+        normalized_power = getProfile('load_profiles_normalized.xlsx', self.buildingType, self.T)
         # Calculate real power based on normalized load profile and annual power demand
-        real_power = [x * self.annualDemand for x in normalized_power]
+        real_power = np.asarray(normalized_power, dtype=np.float64) * self.annualDemand
         return real_power
     
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
+        powerVar = list(self.Econnections[0].powerVariables.values())
 
-        self.model.addConstrs(powerVar[t] ==  self.power[t] for t in self.T)
+        self.model.addMConstr(identityMatrix(len(self.T)), powerVar, GRB.EQUAL, self.power[self.T])
+
+    def proximalUpdate(self):
+        """Closed-form solution of the nodal problem, the power is fixed by the load profile"""
+        return [self.power[self.T]]
 
     def optimize(self):
         self.model.optimize()
@@ -327,23 +474,26 @@ class ThermalLoad(Device):
         self.heatingType = heatingType
         self.numberHouseholds = numberHouseholds
         self.power = self.determineLoadProfile()
-        assert all(item >=0 for item in self.power)
+        assert np.all(self.power >= 0)
         assert self.heatingType in ['HP', 'Heating']
 
         self.setConstraints()
 
     def determineLoadProfile(self):
-        df = pd.read_excel('ThermalLoadHousehold.xlsx')
-        ThermalDemand = df[self.heatingType].tolist()
+        ThermalDemand = getProfile('ThermalLoadHousehold.xlsx', self.heatingType, self.T)
         # Calculate real power based on normalized load profile and annual power demand
-        real_demand = [x * self.numberHouseholds for x in ThermalDemand]
+        real_demand = np.asarray(ThermalDemand, dtype=np.float64) * self.numberHouseholds
         return real_demand
     
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
+        powerVar = list(self.Econnections[0].powerVariables.values())
+
+        self.model.addMConstr(identityMatrix(len(self.T)), powerVar, GRB.EQUAL, self.power[self.T])
 
-        self.model.addConstrs(powerVar[t] ==  self.power[t] for t in self.T)
+    def proximalUpdate(self):
+        """Closed-form solution of the nodal problem, the power is fixed by the load profile"""
+        return [self.power[self.T]]
 
     def optimize(self):
         self.model.optimize()
@@ -361,20 +511,14 @@ class TransmissionLine(Device):
         self._updateObjective()
 
     def _updateObjective(self):
-        powerVar_1 = self.Econnections[0].powerVariables
-        powerVar_2 = self.Econnections[1].powerVariables
-        penaltyPar_1 = self.Econnections[0].penaltyTerm
-        penaltyPar_2 = self.Econnections[1].penaltyTerm
-        # objective  = gp.quicksum(self.alpha * (powerVar_1[t] * powerVar_1[t])  for t in self.T)
-        objective =  gp.quicksum((self.rho/2)*(powerVar_1[t] - penaltyPar_1[t]) * (powerVar_1[t] - penaltyPar_1[t]) for t in self.T)
-        objective +=  gp.quicksum((self.rho/2)*(powerVar_2[t] - penaltyPar_2[t]) * (powerVar_2[t] - penaltyPar_2[t]) for t in self.T)
-
-        self.model.setObjective(objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        self._setPenaltyObjective()
 
 
     def setConstraints(self):
             """Sets the constraints of the optimization model"""
+            if self.matrixAPI:
+                self._setMatrixConstraints()
+                return
             powerVar_1 = self.Econnections[0].powerVariables
             powerVar_2 = self.Econnections[1].powerVariables
 
@@ -383,6 +527,16 @@ class TransmissionLine(Device):
                 self.model.addConstrs((powerVar_1[t] - powerVar_2[t]) / 2 <= self.power_max for t in self.T)
                 self.model.addConstrs((powerVar_2[t] - powerVar_1[t]) / 2 <= self.power_max for t in self.T)
 
+    def _setMatrixConstraints(self):
+        """Sets the same constraints as setConstraints through the matrix API"""
+        n = len(self.T)
+        power = list(self.Econnections[0].powerVariables.values()) + list(self.Econnections[1].powerVariables.values())
+
+        self.model.addMConstr(sp.hstack([identityMatrix(n), identityMatrix(n)], format='csr'), power, GRB.EQUAL, np.zeros(n))
+        if self.power_max is not None:
+            self.model.addMConstr(sp.hstack([identityMatrix(n, 1/2), identityMatrix(n, -1/2)], format='csr'), power, GRB.LESS_EQUAL, np.full(n, self.power_max))
+            self.model.addMConstr(sp.hstack([identityMatrix(n, -1/2), identityMatrix(n, 1/2)], format='csr'), power, GRB.LESS_EQUAL, np.full(n, self.power_max))
+
 
     def getTotalOpex(self):
         total_sum = sum(self.alpha * x * x for x in self.Econnections[0].powerValues)
@@ -392,6 +546,16 @@ class TransmissionLine(Device):
         hourly_opex = [self.alpha * x * x for x in self.Econnections[0].powerValues]
         return hourly_opex
 
+    def proximalUpdate(self):
+        """Closed-form solution of the nodal problem, the projection of (penalty_1, penalty_2) on power_1 = -power_2 within the capacity
+
+        With a different rho on both ends the projection is weighted by rho.
+        """
+        capacity = -POWER_LB if self.power_max is None else min(self.power_max, -POWER_LB)
+        rho_1, rho_2 = self.connectionRho(0), self.connectionRho(1)
+        power = np.clip((rho_1 * self._penaltyArray(0) - rho_2 * self._penaltyArray(1)) / (rho_1 + rho_2), -capacity, capacity)
+        return [power, -power]
+
     def optimize(self):
         self.model.optimize()
 
@@ -425,15 +589,13 @@ class Storage(Device):
         self.setConstraints()
 
     def _updateObjective(self):
-        powerVar   = self.Econnections[0].powerVariables
-        penaltyPar = self.Econnections[0].penaltyTerm
-        objective =  gp.quicksum((self.rho/2)*(powerVar[t] - penaltyPar[t]) * (powerVar[t] - penaltyPar[t]) for t in self.T)
-
-        self.model.setObjective(objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        self._setPenaltyObjective()
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            self._setMatrixConstraints()
+            return
         powerVar = self.Econnections[0].powerVariables
 
         if self.discharge_max is not None: 
@@ -448,6 +610,49 @@ class Storage(Device):
         self.model.addConstrs(self.energy[t] >= 0 for t in self.T ) 
         self.model.addConstrs(self.energy[t] <= self.energy_max for t in self.T ) 
 
+    def _setMatrixConstraints(self):
+        """Sets the same constraints as setConstraints through the matrix API"""
+        n = len(self.T)
+        power = list(self.Econnections[0].powerVariables.values())
+        energy = list(self.energy.values())
+
+        if self.discharge_max is not None: 
+            self.model.addMConstr(identityMatrix(n), power, GRB.GREATER_EQUAL, np.full(n, -self.discharge_max))
+
+        if self.charge_max is not None: 
+            self.model.addMConstr(identityMatrix(n), power, GRB.LESS_EQUAL, np.full(n, self.charge_max))
+
+        # energy[0] - power[0] == energy_init and energy[t] - energy[t-1] - power[t] == 0
+        rhs = np.zeros(n)
+        rhs[0] = self.energy_init
+        self.model.addMConstr(sp.hstack([recursionMatrix(n), identityMatrix(n, -1)], format='csr'), energy + power, GRB.EQUAL, rhs)
+
+        self.model.addMConstr(identityMatrix(n), energy, GRB.GREATER_EQUAL, np.zeros(n))
+        self.model.addMConstr(identityMatrix(n), energy, GRB.LESS_EQUAL, np.full(n, self.energy_max))
+
+    def structuredUpdate(self):
+        """Solves the nodal problem with the banded QP solver in terms of the energy, power[t] = energy[t] - energy[t-1]
+
+        The penalty (rho/2)*(energy[t] - energy[t-1] - penalty[t])^2 gives a tridiagonal Hessian, the power limits become
+        limits on consecutive differences of the energy.
+        """
+        n = len(self.T)
+        target = self._penaltyArray().copy()
+        target[0] += self.energy_init
+        rho = self.connectionRho()
+        diagonal = np.full(n, 2.0 * rho)
+        diagonal[-1] = rho
+        c = -rho * target
+        c[:-1] += rho * target[1:]
+        power_lb = max(-bound(self.discharge_max, np.inf), POWER_LB)
+        power_ub = bound(self.charge_max, np.inf)
+        lb = np.zeros(n)
+        ub = np.full(n, bound(self.energy_max, np.inf))
+        lb[0] = max(lb[0], self.energy_init + power_lb)
+        ub[0] = min(ub[0], self.energy_init + power_ub)
+        energy = solveBandedQP(diagonal, np.full(n - 1, -rho), c, lb, ub, np.full(n - 1, power_lb), np.full(n - 1, power_ub))
+        return [np.diff(energy, prepend=self.energy_init)]
+
     def setVariables(self):
         """Sets the Variables of the optimization model"""
         self.energy = self.model.addVars(self.T)
@@ -467,17 +672,21 @@ class PowerDissipation(Device):
         self.setConstraints()
 
     def _updateObjective(self):
-        powerVar   = self.Econnections[0].powerVariables
-        penaltyPar = self.Econnections[0].penaltyTerm
-        objective =  gp.quicksum((self.rho/2)*(powerVar[t] - penaltyPar[t]) * (powerVar[t] - penaltyPar[t]) for t in self.T)
-        self.model.setObjective(objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        self._setPenaltyObjective()
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            power = list(self.Econnections[0].powerVariables.values())
+            self.model.addMConstr(identityMatrix(len(self.T)), power, GRB.GREATER_EQUAL, np.zeros(len(self.T)))
+            return
         powerVar = self.Econnections[0].powerVariables
         self.model.addConstrs(powerVar[t] >= 0  for t in self.T)
 
+    def proximalUpdate(self):
+        """Closed-form solution of the nodal problem, the projection of the penalty term on power >= 0"""
+        return [np.maximum(self._penaltyArray(), 0)]
+
     def optimize(self):
         self.model.optimize()
 
@@ -493,18 +702,21 @@ class HeatDissipation(Device):
         self.setConstraints()
 
     def _updateObjective(self):
-        heatVar   = self.Econnections[0].heatVariables
-        penaltyPar = self.Econnections[0].penaltyTerm
-        objective =  gp.quicksum((self.rho/2)*(heatVar[t] - penaltyPar[t]) * (heatVar[t] - penaltyPar[t]) for t in self.T)
-
-        self.model.setObjective(objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        self._setPenaltyObjective()
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            heat = list(self.Econnections[0].powerVariables.values())
+            self.model.addMConstr(identityMatrix(len(self.T)), heat, GRB.GREATER_EQUAL, np.zeros(len(self.T)))
+            return
         heatVar = self.Econnections[0].powerVariables
         self.model.addConstrs(heatVar[t] >= 0  for t in self.T)
 
+    def proximalUpdate(self):
+        """Closed-form solution of the nodal problem, the projection of the penalty term on heat >= 0"""
+        return [np.maximum(self._penaltyArray(), 0)]
+
     def optimize(self):
         self.model.optimize()
 
@@ -520,17 +732,19 @@ class ExternalPower(Device):
         self._updateObjective()
         self.setConstraints()
 
-    def _updateObjective(self):
+    def _costExpression(self):
         powerVar   = self.Econnections[0].powerVariables
-        penaltyPar = self.Econnections[0].penaltyTerm
-        objective  = gp.quicksum(-self.price * powerVar[t] for t in self.T)
-        objective  +=  gp.quicksum((self.rho/2)*(powerVar[t] - penaltyPar[t]) * (powerVar[t] - penaltyPar[t]) for t in self.T)
+        return gp.quicksum(-self.price * powerVar[t] for t in self.T)
 
-        self.model.setObjective(objective, gp.GRB.MINIMIZE)
-        self.model.update()
+    def _updateObjective(self):
+        self._setPenaltyObjective()
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            power = list(self.Econnections[0].powerVariables.values())
+            self.model.addMConstr(identityMatrix(len(self.T)), power, GRB.LESS_EQUAL, np.zeros(len(self.T)))
+            return
         powerVar = self.Econnections[0].powerVariables
         self.model.addConstrs(powerVar[t] <= 0  for t in self.T)
 
@@ -542,6 +756,10 @@ class ExternalPower(Device):
         hourly_opex = [-self.price * x for x in self.Econnections[0].powerValues]
         return hourly_opex
 
+    def proximalUpdate(self):
+        """Closed-form solution of the nodal problem, the penalty term shifted by price/rho and clipped to the bounds"""
+        return [np.clip(self._penaltyArray() + self.price / self.connectionRho(), POWER_LB, 0)]
+
     def optimize(self):
         self.model.optimize()
 
@@ -551,15 +769,19 @@ class FixedLoadTest(Device):
     def __init__(
         self, T, power=None, name=None
     ):
-        super().__init__(T, [EConnection()], name)
+        super().__init__(T, [EConnection()], name=name)
         self.T = T
         self.power = power
         self.setConstraints()
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
-        self.model.addConstrs(powerVar[t] ==  self.power[t] for t in self.T)
+        powerVar = list(self.Econnections[0].powerVariables.values())
+        self.model.addMConstr(identityMatrix(len(self.T)), powerVar, GRB.EQUAL, np.asarray(self.power, dtype=np.float64)[self.T])
+
+    def proximalUpdate(self):
+        """Closed-form solution of the nodal problem, the power is fixed by the given profile"""
+        return [np.asarray(self.power, dtype=np.float64)[self.T]]
 
     def optimize(self):
         self.model.optimize()
@@ -1,27 +1,188 @@
+import numpy as np
 import matplotlib.pyplot as plt
 
 class Network:
+    # ADMM state arrays, saved by getState and restored in place by loadState
+    _STATE = ('dual', 'balance', 'power', 'prev_power', 'penalty', 'consensus', '_prev_dual', '_prev_consensus')
 
     def __init__(self, T, Econnections, name = None):
         """Initialize a new Terminal object. """
         self.Econnections = Econnections
         self.name = "Line" if name is None else name
-        self.dual = [0]*len(T)
-        self.balance = [0]*len(T)
-        for Econnection in Econnections:
+        self.dual = np.zeros(len(T))
+        self.balance = np.zeros(len(T))
+        # ADMM state of the connections, one row per connection, the connections hold views of their row
+        self.power = np.zeros((len(Econnections), len(T)))
+        self.prev_power = np.zeros((len(Econnections), len(T)))
+        self.penalty = np.zeros((len(Econnections), len(T)))
+        # Consensus power of every connection (power - balance without relaxation) and the state of the previous
+        # iteration, the extrapolated dual and consensus are only set by accelerate
+        self.consensus = np.zeros((len(Econnections), len(T)))
+        self._prev_dual = np.zeros(len(T))
+        self._prev_consensus = np.zeros((len(Econnections), len(T)))
+        self._dual_hat = None
+        self._consensus_hat = None
+        self._consensus_change = 0.0
+        for i, Econnection in enumerate(Econnections):
             Econnection.set_network(self)
+            Econnection.setState(self.power[i], self.prev_power[i], self.penalty[i])
         
 
     def updateBalance(self):
         """This function updates the balance betwen the two incoming power flows on the line"""
-        #This loss part is new and still in test phase 
-        zipped_powers = zip(*(Econnection.powerValues for Econnection in self.Econnections))
-        self.balance  = [sum(powers) / len(powers) for powers in zipped_powers]
-        #This balance phase was just average is now average - loss -> balance will allways be a bit shifted
-
-    def updateDual(self):
-        """This function updates the dual variable of the line by adding the imbalance to the previous dual variable """
-        self.dual = [x + y for x, y in zip(self.dual, self.balance)]
+        # Connections solved in their own model are copied in, the others wrote their row through setPowerValues
+        for row, Econnection in zip(self.power, self.Econnections):
+            if not Econnection.storesValues:
+                row[:] = Econnection.powerValues
+        np.mean(self.power, axis=0, out=self.balance)
+
+    def updateDual(self, alpha=1):
+        """This function updates the dual variable of the line by adding the imbalance to the previous dual variable
+
+        Args:
+            alpha (float): Relaxation parameter, the imbalance is scaled by alpha
+        """
+        self._prev_dual[:] = self.dual
+        start = self.dual if self._dual_hat is None else self._dual_hat
+        np.add(start, alpha * self.balance, out=self.dual)
+
+    def updateConsensus(self, alpha=1):
+        """Updates the consensus power of all connections, the projection of the (relaxed) power on a zero balance
+
+        With alpha = 1 the consensus power is power - balance, with alpha in (1, 2) the step is over-relaxed.
+        """
+        self.prev_power[:] = self.power
+        self._prev_consensus[:] = self.consensus
+        start = self._prev_consensus if self._consensus_hat is None else self._consensus_hat
+        self.consensus[:] = alpha * (self.power - self.balance) + (1 - alpha) * start
+        self._consensus_change = float(np.linalg.norm(self.consensus - start))
+
+    def accelerate(self, beta):
+        """Extrapolates the dual and the consensus power by beta times their change in the last iteration, beta = 0 restarts"""
+        if beta == 0:
+            self._dual_hat = None
+            self._consensus_hat = None
+            return
+        self._dual_hat = self.dual + beta * (self.dual - self._prev_dual)
+        self._consensus_hat = self.consensus + beta * (self.consensus - self._prev_consensus)
+
+    def updatePenalties(self):
+        """Updates the penalty terms of all connections from the consensus power and the dual, or their extrapolation"""
+        dual = self.dual if self._dual_hat is None else self._dual_hat
+        consensus = self.consensus if self._consensus_hat is None else self._consensus_hat
+        np.subtract(consensus, dual, out=self.penalty)
+
+    def residuals(self):
+        """Primal and dual residual norms of the last iteration, to be called after updateConsensus
+
+        The primal residual is the imbalance seen by every connection, the dual residual is rho times the change of
+        the consensus power since the previous iteration.
+        """
+        primal = np.sqrt(len(self.Econnections)) * np.linalg.norm(self.balance)
+        return float(primal), float(self.rho * self._consensus_change)
+
+    def tolerances(self, eps_abs, eps_rel):
+        """Primal and dual tolerance of the stopping criterion of Boyd et al. (2011), section 3.3.1"""
+        primal = np.sqrt(self.power.size) * eps_abs + eps_rel * max(np.linalg.norm(self.power), np.linalg.norm(self.consensus))
+        dual = np.sqrt(self.power.size) * eps_abs + eps_rel * self.rho * np.sqrt(len(self.Econnections)) * np.linalg.norm(self.dual)
+        return float(primal), float(dual)
+
+    @property
+    def rho(self):
+        """Penalty parameter of the network, the rho its connections use, their own or the rho of their device
+
+        Raises:
+            ValueError: When the connections use different rho, one rho has to be set with setRho
+        """
+        rhos = {Econnection.penaltyRho for Econnection in self.Econnections}
+        if len(rhos) > 1:
+            raise ValueError(f"The connections of {self.name} use different rho {sorted(rhos)}, set one with setRho")
+        return rhos.pop()
+
+    @property
+    def prices(self):
+        """Price of the network per time step, rho times the scaled dual"""
+        return self.rho * self.dual
+
+    def setRho(self, rho):
+        """Sets the penalty parameter of the connections, the scaled dual is rescaled so rho * dual stays the same"""
+        rhos = {Econnection.penaltyRho for Econnection in self.Econnections}
+        if len(rhos) == 1:
+            scale = rhos.pop() / rho
+            for dual in (self.dual, self._prev_dual, self._dual_hat):
+                if dual is not None:
+                    dual *= scale
+        elif np.any(self.dual):
+            raise ValueError(f"The connections of {self.name} use different rho {sorted(rhos)}, the dual can not be rescaled")
+        for Econnection in self.Econnections:
+            Econnection.rho = rho
+
+    def reset(self):
+        """Resets the ADMM state to the start of a run, rho goes back to the rho of the devices"""
+        for array in (self.dual, self.balance, self.power, self.prev_power, self.penalty, self.consensus, self._prev_dual, self._prev_consensus):
+            array[:] = 0
+        self._dual_hat = None
+        self._consensus_hat = None
+        self._consensus_change = 0.0
+        for Econnection in self.Econnections:
+            Econnection.rho = None
+
+    def getState(self):
+        """Returns the ADMM state of the network and its connections as a dict of arrays, the rho of a connection is nan
+        when it uses the rho of its device"""
+        state = {name: getattr(self, name) for name in self._STATE}
+        state['connection_rho'] = np.array([np.nan if c.rho is None else c.rho for c in self.Econnections], dtype=np.float64)
+        if self._dual_hat is not None:
+            state['dual_hat'] = self._dual_hat
+            state['consensus_hat'] = self._consensus_hat
+        return state
+
+    def loadState(self, state, extrapolation=True):
+        """Restores a state of getState in place, so the connections keep their views
+
+        Args:
+            extrapolation (bool): Also restores the extrapolated dual and consensus power of accelerated ADMM
+
+        Raises:
+            ValueError: When the state belongs to a network with other connections or time steps
+        """
+        for name in self._STATE:
+            target = getattr(self, name)
+            value = np.asarray(state[name])
+            if value.shape != target.shape:
+                raise ValueError(f"State {name} of {self.name} has shape {value.shape}, expected {target.shape}")
+            target[:] = value
+        for Econnection, rho in zip(self.Econnections, state['connection_rho']):
+            Econnection.rho = None if np.isnan(rho) else float(rho)
+        has_hat = extrapolation and 'dual_hat' in state
+        self._dual_hat = np.array(state['dual_hat']) if has_hat else None
+        self._consensus_hat = np.array(state['consensus_hat']) if has_hat else None
+        self._consensus_change = 0.0
+        self.updatePenalties()
+
+    def warmStart(self, prices, power=None):
+        """Starts ADMM from the prices of an earlier solution, the scaled dual becomes prices / rho with the rho the connections use
+
+        Without power the consensus power starts at zero, with the power of every connection (one row per connection)
+        it starts at the projection of that power on a zero balance.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        if prices.shape != self.dual.shape:
+            raise ValueError(f"Prices of {self.name} have shape {prices.shape}, expected {self.dual.shape}")
+        self.dual[:] = prices / self.rho
+        self._prev_dual[:] = self.dual
+        if power is None:
+            self.power[:] = 0
+        else:
+            self.power[:] = power
+        self.prev_power[:] = self.power
+        np.mean(self.power, axis=0, out=self.balance)
+        np.subtract(self.power, self.balance, out=self.consensus)
+        self._prev_consensus[:] = self.consensus
+        self._dual_hat = None
+        self._consensus_hat = None
+        self._consensus_change = 0.0
+        self.updatePenalties()
 
     def plotData(self):
         # months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
@@ -0,0 +1,185 @@
+import numpy as np
+from scipy.linalg import solveh_banded, solve_banded
+
+
+def tridiagonalProduct(diagonal, off_diagonal, y):
+    """Product of the symmetric tridiagonal matrix with y"""
+    result = diagonal * y
+    result[:-1] += off_diagonal * y[1:]
+    result[1:] += off_diagonal * y[:-1]
+    return result
+
+
+class _Constraints:
+    """The inequalities lb <= y <= ub and d_lb <= y[1:] - y[:-1] <= d_ub written as G y <= h, infinite bounds are left out"""
+
+    def __init__(self, lb, ub, d_lb, d_ub):
+        self.n = len(lb)
+        self.ub = np.flatnonzero(np.isfinite(ub))
+        self.lb = np.flatnonzero(np.isfinite(lb))
+        self.d_ub = np.flatnonzero(np.isfinite(d_ub))
+        self.d_lb = np.flatnonzero(np.isfinite(d_lb))
+        self.sizes = np.cumsum([len(self.ub), len(self.lb), len(self.d_ub), len(self.d_lb)])
+        self.h = np.concatenate([ub[self.ub], -lb[self.lb], d_ub[self.d_ub], -d_lb[self.d_lb]])
+
+    def _split(self, z):
+        return np.split(z, self.sizes[:-1])
+
+    def G(self, y):
+        d = y[1:] - y[:-1]
+        return np.concatenate([y[self.ub], -y[self.lb], d[self.d_ub], -d[self.d_lb]])
+
+    def GT(self, z):
+        z_ub, z_lb, z_dub, z_dlb = self._split(z)
+        result = np.zeros(self.n)
+        result[self.ub] += z_ub
+        result[self.lb] -= z_lb
+        v = np.zeros(self.n - 1)
+        v[self.d_ub] += z_dub
+        v[self.d_lb] -= z_dlb
+        result[1:] += v
+        result[:-1] -= v
+        return result
+
+    def weights(self, w):
+        """Diagonal and off-diagonal of G' diag(w) G"""
+        w_ub, w_lb, w_dub, w_dlb = self._split(w)
+        diagonal = np.zeros(self.n)
+        diagonal[self.ub] += w_ub
+        diagonal[self.lb] += w_lb
+        v = np.zeros(self.n - 1)
+        v[self.d_ub] += w_dub
+        v[self.d_lb] += w_dlb
+        diagonal[1:] += v
+        diagonal[:-1] += v
+        return diagonal, -v
+
+
+def _solveTridiagonal(banded, rhs):
+    """Solves the symmetric tridiagonal system in upper banded form, with Cholesky or, when rounding makes it fail near
+    the end of the interior point method, with LU"""
+    try:
+        return solveh_banded(banded, rhs, check_finite=False)
+    except np.linalg.LinAlgError:
+        full = np.zeros((3, banded.shape[1]))
+        full[0, 1:] = banded[0, 1:]
+        full[1] = banded[1]
+        full[2, :-1] = banded[0, 1:]
+        return solve_banded((1, 1), full, rhs, check_finite=False)
+
+
+def _stepLength(x, dx):
+    """Largest step in (0, 1] that keeps x + step*dx nonnegative"""
+    negative = dx < 0
+    if not np.any(negative):
+        return 1.0
+    return min(1.0, float(np.min(-x[negative] / dx[negative])))
+
+
+def solveBandedQP(diagonal, off_diagonal, c, lb, ub, d_lb, d_ub, first=None, tol=1e-9, max_iter=100, accept=1e-6):
+    """Solves min 1/2 y'Hy + c'y  s.t.  lb <= y <= ub,  d_lb <= y[t] - y[t-1] <= d_ub  with H symmetric tridiagonal
+
+    Primal-dual interior point method with Mehrotra predictor-corrector steps. The Newton system of box and
+    difference constraints stays tridiagonal, so every iteration costs O(n).
+
+    Args:
+        diagonal (array): Diagonal of H, length n
+        off_diagonal (array): Off-diagonal of H, length n-1
+        lb, ub (array): Bounds on y, length n, may be infinite
+        d_lb, d_ub (array): Bounds on the differences y[t] - y[t-1], length n-1, may be infinite
+        first (float): Fixes y[0] to this value when given
+        tol (float): Relative tolerance on the primal and dual residual and the complementarity
+        accept (float): When rounding stops the method short of tol, the best iterate is returned if it reached accept
+
+    Raises:
+        RuntimeError: When the method does not converge, e.g. because the problem is infeasible
+    """
+    diagonal, off_diagonal, c, lb, ub, d_lb, d_ub = (np.array(a, dtype=np.float64) for a in (diagonal, off_diagonal, c, lb, ub, d_lb, d_ub))
+    if first is not None:
+        if not lb[0] - tol <= first <= ub[0] + tol:
+            raise RuntimeError("Fixed first value outside of its bounds")
+        if len(c) == 1:
+            return np.array([first], dtype=np.float64)
+        c[1] += off_diagonal[0] * first
+        lb[1] = max(lb[1], first + d_lb[0])
+        ub[1] = min(ub[1], first + d_ub[0])
+        rest = solveBandedQP(diagonal[1:], off_diagonal[1:], c[1:], lb[1:], ub[1:], d_lb[1:], d_ub[1:], tol=tol, max_iter=max_iter, accept=accept)
+        return np.concatenate([[first], rest])
+
+    n = len(c)
+    constraints = _Constraints(lb, ub, d_lb, d_ub)
+    h = constraints.h
+    m = len(h)
+    banded = np.zeros((2, n))
+    if m == 0:
+        banded[0, 1:] = off_diagonal
+        banded[1] = diagonal
+        return solveh_banded(banded, -c)
+
+    y = np.clip(np.zeros(n), lb, ub)
+    s = np.maximum(h - constraints.G(y), 1.0)
+    z = np.ones(m)
+    scale_c = 1 + np.max(np.abs(c))
+    scale_h = 1 + np.max(np.abs(h))
+    best, best_error = None, np.inf
+    for _ in range(max_iter):
+        r_d = tridiagonalProduct(diagonal, off_diagonal, y) + c + constraints.GT(z)
+        r_p = constraints.G(y) + s - h
+        mu = float(s @ z) / m
+        error = max(np.max(np.abs(r_d)) / scale_c, np.max(np.abs(r_p)) / scale_h, mu / max(scale_c, scale_h))
+        if error <= tol:
+            return y
+        if error < best_error:
+            best, best_error = y.copy(), error
+
+        def direction(r_c):
+            dy = _solveTridiagonal(banded, -r_d - constraints.GT((z * r_p - r_c) / s))
+            ds = -r_p - constraints.G(dy)
+            dz = -(r_c + z * ds) / s
+            return dy, ds, dz
+
+        # Predictor step towards mu = 0, then a corrector step with the centering parameter of Mehrotra
+        with np.errstate(all='ignore'):
+            w_diagonal, w_off_diagonal = constraints.weights(z / s)
+            banded[0, 1:] = off_diagonal + w_off_diagonal
+            banded[1] = diagonal + w_diagonal
+            dy, ds, dz = direction(s * z)
+            alpha = min(_stepLength(s, ds), _stepLength(z, dz))
+            mu_affine = float((s + alpha * ds) @ (z + alpha * dz)) / m
+            sigma = (mu_affine / mu) ** 3
+            dy, ds, dz = direction(s * z + ds * dz - sigma * mu)
+        if not (np.all(np.isfinite(dy)) and np.all(np.isfinite(ds)) and np.all(np.isfinite(dz))):
+            break
+        alpha = min(1.0, 0.99 * min(_stepLength(s, ds), _stepLength(z, dz)))
+        y += alpha * dy
+        s += alpha * ds
+        z += alpha * dz
+
+    if best_error <= accept:
+        return best
+    raise RuntimeError(f"Banded QP did not converge in {max_iter} iterations")
+
+
+def checkAgainstGurobi(device, trials=5, scale=10, seed=0):
+    """Compares structuredUpdate of the device with the Gurobi solution of its model for random penalty terms
+
+    The penalty terms of the device are restored afterwards.
+
+    Returns:
+        float: Largest absolute difference in power over all trials
+    """
+    rng = np.random.default_rng(seed)
+    saved = [c.penaltyTerm for c in device.Econnections]
+    difference = 0.0
+    for _ in range(trials):
+        for connection in device.Econnections:
+            connection._penalty_term = rng.normal(0, scale, len(device.T)).tolist()
+        powers = device.structuredUpdate()
+        device._updateObjective()
+        device.optimize()
+        for connection, power in zip(device.Econnections, powers):
+            solved = np.array([var.X for var in connection.powerVariables.values()])
+            difference = max(difference, float(np.max(np.abs(power - solved))))
+    for connection, penalty in zip(device.Econnections, saved):
+        connection._penalty_term = penalty
+    return difference
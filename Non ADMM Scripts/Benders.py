@@ -0,0 +1,117 @@
+"""Benders decomposition of the investment problem with the potential devices
+
+The loop is sequential: the subproblems are solved one after the other and Gurobi uses its own threads within
+every solve, there is no pool of subproblem solves in parallel. The devices index their hours from 0 and couple
+hour t to t-1, so there is no built-in split of the horizon into weekly or other blocks, fromPotentialDevices gives
+the whole model as a single subproblem.
+"""
+import time
+import numpy as np
+import gurobipy as gp
+from gurobipy import GRB
+from Model_Build import optimizeModel
+
+
+class BendersSubproblem:
+    """Operational problem of a system with potential devices, solved with the investment decisions fixed
+
+    The z variables of the potential devices are fixed through their bounds, so the reduced costs of z are
+    the subgradient of the operational cost with respect to the investment decisions.
+
+    Args:
+        model (gp.Model): Model of the system with the potential devices attached to their networks
+        potential_devices (list): Potential devices of the model, in the same order for every subproblem
+    """
+
+    def __init__(self, model, potential_devices):
+        """Initialize the subproblem and remember the original bounds of z. """
+        self.model = model
+        self.z = [d.investmentVar for d in potential_devices]
+        self.model.update()
+        self._bounds = (self.model.getAttr('LB', self.z), self.model.getAttr('UB', self.z))
+
+    def solve(self, z_values):
+        """Returns the operational cost and its subgradient for the investment decisions z_values"""
+        self.model.setAttr('LB', self.z, list(z_values))
+        self.model.setAttr('UB', self.z, list(z_values))
+        status = optimizeModel(self.model)
+        if status != GRB.OPTIMAL:
+            raise RuntimeError(f"Subproblem not solved to optimality, status {status}")
+        return self.model.ObjVal, np.asarray(self.model.getAttr('RC', self.z), dtype=np.float64)
+
+    def restore(self):
+        """Restores the original bounds of z"""
+        self.model.setAttr('LB', self.z, self._bounds[0])
+        self.model.setAttr('UB', self.z, self._bounds[1])
+
+#########################################################################################################################################
+
+class BendersEngine:
+    """Benders decomposition of the investment problem into a binary master and operational subproblems
+
+    The master chooses binary investments within the budget and carries one cost variable theta per subproblem.
+    Every iteration the subproblems are solved for the master decision and add the optimality cut
+
+        theta_k >= Q_k(z_hat) + g_k' (z - z_hat)
+
+    The best subproblem total is an upper bound, the master objective a lower bound.
+
+    Args:
+        subproblems (list): BendersSubproblem per part of the problem, Q(z) is the sum over the subproblems
+        investment_costs (list): Investment cost of every potential device
+        budget (float): Investment budget
+    """
+
+    def __init__(self, subproblems, investment_costs, budget, tolerance=1e-4, max_iter=50, verbose=True):
+        """Initialize the engine and build the master problem. """
+        self.subproblems = subproblems
+        self.investment_costs = np.asarray(investment_costs, dtype=np.float64)
+        self.budget = budget
+        self.tolerance = tolerance
+        self.max_iter = max_iter
+        self.verbose = verbose
+        self.history = []
+        self.lower_bound = -np.inf
+        self.upper_bound = np.inf
+        self.best_z = None
+
+        self.master = gp.Model()
+        self.master.setParam('OutputFlag', 0)
+        self.z = self.master.addMVar(len(self.investment_costs), vtype=GRB.BINARY, name="z")
+        self.theta = self.master.addMVar(len(subproblems), lb=-GRB.INFINITY, name="theta")
+        self.master.addConstr(self.investment_costs @ self.z <= budget, name="budget_constraint")
+        self.master.setObjective(self.theta.sum(), GRB.MINIMIZE)
+
+    @classmethod
+    def fromPotentialDevices(cls, model, potential_devices, budget, **kwargs):
+        """Engine with the whole model as single subproblem"""
+        return cls([BendersSubproblem(model, potential_devices)], [d.investment_cost for d in potential_devices], budget, **kwargs)
+
+    def solve(self, z_start=None):
+        """Iterates until the gap between the bounds is below the tolerance, returns the best investment decision"""
+        z_hat = np.zeros(len(self.investment_costs)) if z_start is None else np.asarray(z_start, dtype=np.float64)
+        for k in range(self.max_iter):
+            start = time.perf_counter()
+            results = [sub.solve(z_hat) for sub in self.subproblems]
+            total = sum(cost for cost, _ in results)
+            if total < self.upper_bound:
+                self.upper_bound = total
+                self.best_z = z_hat.copy()
+
+            for i, (cost, gradient) in enumerate(results):
+                self.master.addConstr(self.theta[i] >= cost + gradient @ self.z - gradient @ z_hat, name=f"cut_{k}_{i}")
+            self.master.optimize()
+            self.lower_bound = self.master.ObjVal
+            z_hat = np.round(self.z.X)
+
+            gap = self.upper_bound - self.lower_bound
+            self.history.append({'iteration': k, 'lower_bound': self.lower_bound, 'upper_bound': self.upper_bound,
+                                 'gap': gap, 'time': time.perf_counter() - start})
+            if self.verbose:
+                print(f"Iteration {k}: LB {self.lower_bound:.4f}, UB {self.upper_bound:.4f}, gap {gap:.4f}")
+            if gap <= self.tolerance * max(1, abs(self.upper_bound)):
+                break
+
+        for sub in self.subproblems:
+            sub.restore()
+        return self.best_z
@@ -0,0 +1,115 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import gurobipy as gp
+from Model_Build import optimizeModel
+from Devices_Heuristic import HeuristicRenewable, HeuristicStorage, HeuristicTransmissionLine
+from Investment_Heuristics import attachCandidate, detachCandidate, assignGroups, candidateCapacity
+
+# State of a worker process, set by _initWorker
+_worker = {}
+
+
+def describeCandidate(p):
+    """Returns a picklable descriptor from which a worker can recreate the heuristic device"""
+    if p.name in ["Renewable PV", "Renewable Wind"]:
+        return {'kind': 'Renewable', 'net_from': p.net_from, 'net_to': None, 'price': p.investment_cost,
+                'params': {'technology': p.technology, 'install_cap': p.install_cap}}
+    elif p.name == "Storage":
+        return {'kind': 'Storage', 'net_from': p.net_from, 'net_to': None, 'price': p.investment_cost,
+                'params': {'discharge_max': p.discharge_max, 'charge_max': p.charge_max, 'energy_max': p.energy_max}}
+    elif p.name == "Transmission Line":
+        return {'kind': 'Transmission Line', 'net_from': p.net_from, 'net_to': p.net_to, 'price': p.investment_cost,
+                'params': {'length': p.length, 'power_max': p.power_max, 'alpha': p.alpha}}
+    raise ValueError(f"Unknown candidate {p.name}")
+
+
+def createCandidate(descriptor, T, model):
+    """Creates the heuristic device of the descriptor on the model"""
+    params = descriptor['params']
+    if descriptor['kind'] == 'Renewable':
+        price_list = {params['technology']: {params['install_cap']: descriptor['price']}}
+        return HeuristicRenewable(T, model, descriptor['net_from'], price_list, **params)
+    elif descriptor['kind'] == 'Storage':
+        price_list = {'Storage': {params['energy_max']: descriptor['price']}}
+        return HeuristicStorage(T, model, descriptor['net_from'], price_list, **params)
+    elif descriptor['kind'] == 'Transmission Line':
+        price_list = {'Transmission': {params['length']: {params['power_max']: descriptor['price']}}}
+        return HeuristicTransmissionLine(T, model, descriptor['net_from'], descriptor['net_to'], price_list, **params)
+    raise ValueError(f"Unknown candidate {descriptor['kind']}")
+
+
+def _initWorker(build_system, T, threads, build_args):
+    """Builds the base system once in every worker process, on its own Gurobi environment"""
+    env = gp.Env(params={'OutputFlag': 0})
+    model = gp.Model(env=env)
+    model.setParam('Threads', threads)
+    nets = build_system(T, model, *build_args)
+    model.update()
+    _worker.update({'env': env, 'model': model, 'nets': nets, 'T': T, 'candidates': {}})
+
+
+def _evaluateCandidate(descriptor):
+    """Evaluates one candidate in a worker, the detached candidate stays on the worker model for later calls"""
+    model, nets, candidates = _worker['model'], _worker['nets'], _worker['candidates']
+    key = repr(sorted((k, v if k != 'params' else sorted(v.items())) for k, v in descriptor.items()))
+    if key not in candidates:
+        candidates[key] = createCandidate(descriptor, _worker['T'], model)
+    p = candidates[key]
+
+    attachCandidate(p, nets)
+    optimizeModel(model)
+    total_cost = model.ObjVal
+    detachCandidate(p, nets)
+    return total_cost, candidateCapacity(p), p.investment_cost
+
+#########################################################################################################################################
+
+class CandidatePool:
+    """Pool of worker processes that each hold their own copy of the base system to evaluate candidates in parallel
+
+    Usage:
+        with CandidatePool(buildSystem, T, workers=8, threads=4) as pool:
+            results = pool.createDeviceValue(potential_items, benchmark_cost)
+
+    Args:
+        build_system (function): Module level function build_system(T, model, *build_args) that creates the base
+            system on the model and returns its networks, indexed like net_from and net_to of the candidates
+        workers (int): Number of worker processes, by default the number of cores divided by threads
+        threads (int): Gurobi Threads per worker
+    """
+
+    def __init__(self, build_system, T, workers=None, threads=1, build_args=()):
+        """Initialize the pool and start the workers. """
+        self.threads = threads
+        self.workers = workers if workers is not None else max(1, (os.cpu_count() or 1) // threads)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_initWorker,
+            initargs=(build_system, T, threads, build_args),
+        )
+
+    def evaluate(self, descriptors, benchmark_cost):
+        """Returns (capacity, price, total_saving) for every descriptor, in the same order"""
+        results = []
+        for total_cost, capacity, price in self._executor.map(_evaluateCandidate, descriptors):
+            results.append((capacity, price, benchmark_cost - total_cost))
+        return results
+
+    def createDeviceValue(self, potential_items, benchmark_cost):
+        """Parallel version of createDeviceValue, returns (p, name, group, capacity, price, total_saving)"""
+        groups = assignGroups(potential_items)
+        values = self.evaluate([describeCandidate(p) for p in potential_items], benchmark_cost)
+        return [(p, p.name, group, capacity, price, total_saving)
+                for p, group, (capacity, price, total_saving) in zip(potential_items, groups, values)]
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
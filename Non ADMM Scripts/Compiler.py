@@ -0,0 +1,260 @@
+import numpy as np
+import scipy.sparse as sp
+import gurobipy as gp
+from gurobipy import GRB
+from Model_Build import getObjectiveRegistry, ObjectiveRegistry, QuadraticCost
+
+
+class CanonicalProblem:
+    """Optimization problem in canonical form
+
+        min  x'Qx + c'x + const
+        s.t. A x (sense) rhs
+             lb <= x <= ub
+
+    Attributes:
+        A (sp.csr_matrix): Constraint matrix, one row per constraint and one column per variable
+        sense (np.ndarray): Sense of every row, GRB.LESS_EQUAL, GRB.GREATER_EQUAL or GRB.EQUAL
+        Q (sp.csr_matrix): Quadratic part of the objective
+    """
+
+    def __init__(self, A, sense, rhs, lb, ub, c, Q, const=0, vtype=None, names=None):
+        """Initialize the problem from its matrices. """
+        self.A = A
+        self.sense = sense
+        self.rhs = rhs
+        self.lb = lb
+        self.ub = ub
+        self.c = c
+        self.Q = Q
+        self.const = const
+        self.vtype = np.full(len(c), GRB.CONTINUOUS) if vtype is None else vtype
+        self.names = names
+
+    @classmethod
+    def fromModel(cls, model):
+        """Reads the canonical form of a built Gurobi model"""
+        getObjectiveRegistry(model).assemble()
+        model.update()
+        variables = model.getVars()
+        constraints = model.getConstrs()
+        return cls(
+            model.getA().tocsr(),
+            np.array(model.getAttr('Sense', constraints)),
+            np.array(model.getAttr('RHS', constraints)),
+            lb=np.array(model.getAttr('LB', variables)),
+            ub=np.array(model.getAttr('UB', variables)),
+            c=np.array(model.getAttr('Obj', variables)),
+            Q=sp.csr_matrix(model.getQ()),
+            const=model.ObjCon,
+            vtype=np.array(model.getAttr('VType', variables)),
+            names=model.getAttr('VarName', variables),
+        )
+
+    @property
+    def numVars(self):
+        return self.A.shape[1]
+
+    @property
+    def numConstrs(self):
+        return self.A.shape[0]
+
+    def toGurobi(self, model=None):
+        """Loads the problem into a Gurobi model with one addMVar, addMConstr and setMObjective call"""
+        model = gp.Model() if model is None else model
+        x = model.addMVar(self.numVars, lb=self.lb, ub=self.ub, vtype=self.vtype)
+        model.addMConstr(self.A, x, self.sense, self.rhs)
+        model.setMObjective(self.Q, self.c, self.const, xQ_L=x, xQ_R=x, xc=x, sense=GRB.MINIMIZE)
+        model.update()
+        if self.names is not None:
+            model.setAttr('VarName', x.tolist(), self.names)
+        return model
+
+    def writeMPS(self, path):
+        """Writes the problem to an MPS file"""
+        model = self.toGurobi()
+        model.write(path)
+        model.dispose()
+
+#########################################################################################################################################
+
+class CanonicalObjective(ObjectiveRegistry):
+    """Objective registry of a CanonicalModel, QuadraticCost terms are kept as arrays and only expressions go to the model
+
+    Attributes:
+        costs (list): QuadraticCost terms of the registered devices
+    """
+
+    def __init__(self, model):
+        """Initialize an empty registry for the canonical model. """
+        super().__init__(model)
+        self.costs = []
+
+    def _clear(self):
+        super()._clear()
+        self.costs = []
+
+    def _add(self, expr):
+        if isinstance(expr, QuadraticCost):
+            self.costs.append(expr)
+        else:
+            self._objective.add(expr)
+
+#########################################################################################################################################
+
+class CanonicalModel:
+    """Stand-in for gp.Model on which the devices and networks are created to compile the problem into sparse matrices
+
+    Variables live in a scratch Gurobi model that is never solved. Blocks passed to addMConstr are recorded as
+    sparse matrices, which is why the devices always take their matrix API build path on this model. Constraints
+    passed to addConstr or addConstrs are linearized by Gurobi in the scratch model and read back as rows of A.
+    QuadraticCost terms of the devices go into c and Q as arrays, other objective expressions through the
+    scratch model.
+
+    Usage:
+        cm = CanonicalModel()
+        ... create the devices and networks on cm ...
+        problem = cm.compile()
+        m = problem.toGurobi()
+    """
+
+    def __init__(self):
+        """Initialize an empty canonical model. """
+        self._matrix_api = True
+        self._variables = gp.Model()
+        self._variables.setParam('OutputFlag', 0)
+        self._blocks = []
+        self._num_rows = 0
+        self._changes = []
+        self._removed = []
+        self._objective = gp.LinExpr()
+        self._objective_registry = CanonicalObjective(self)
+        self.params = {}
+
+    def addVars(self, *indices, **kwargs):
+        return self._variables.addVars(*indices, **kwargs)
+
+    def addVar(self, **kwargs):
+        return self._variables.addVar(**kwargs)
+
+    def addMConstr(self, A, x, sense, b, name=''):
+        """Records the block of constraints, returns the row numbers of the new constraints"""
+        A = sp.coo_matrix(A)
+        rows = np.arange(self._num_rows, self._num_rows + A.shape[0])
+        self._blocks.append((A, list(x), sense, np.broadcast_to(np.asarray(b, dtype=np.float64), (A.shape[0],))))
+        self._num_rows += A.shape[0]
+        return rows
+
+    def addConstr(self, constr, name=''):
+        """Records a linear constraint, also in matrix form, returns its row number or an array of row numbers"""
+        constrs = self._variables.addConstr(constr, name=name)
+        if isinstance(constrs, gp.MConstr):
+            rows = self._addLinearized(np.ravel(np.array(constrs.tolist(), dtype=object)).tolist())
+            return rows.reshape(constrs.shape)
+        return int(self._addLinearized([constrs])[0])
+
+    def addConstrs(self, generator, name=''):
+        """Records the linear constraints of the generator, returns an array of their row numbers"""
+        return self._addLinearized(list(self._variables.addConstrs(generator, name=name).values()))
+
+    def _addLinearized(self, constrs):
+        rows = np.arange(self._num_rows, self._num_rows + len(constrs))
+        self._blocks.append((None, constrs, None, None))
+        self._num_rows += len(constrs)
+        return rows
+
+    def chgCoeff(self, row, var, value):
+        """Overrides the coefficient of the variable in the row, later changes win"""
+        self._changes.append((int(row), var, value))
+
+    def remove(self, rows):
+        """Removes the rows from the compiled problem"""
+        self._removed.extend(np.atleast_1d(rows).tolist())
+
+    def setObjective(self, expr, sense=GRB.MINIMIZE):
+        """Sets the objective expression, costs registered as QuadraticCost are added to it in compile"""
+        self._objective = expr
+
+    def getObjective(self):
+        return self._objective
+
+    def setParam(self, name, value):
+        self.params[name] = value
+
+    def update(self):
+        pass
+
+    def compile(self):
+        """Returns the recorded problem as a CanonicalProblem"""
+        getObjectiveRegistry(self).assemble()
+        self._variables.setObjective(self._objective, GRB.MINIMIZE)
+        self._variables.update()
+        n = self._variables.NumVars
+        if self._variables.NumConstrs > 0:
+            linearized = self._variables.getA().tocsr()
+            linearized_sense = np.array(self._variables.getAttr('Sense', self._variables.getConstrs()))
+            linearized_rhs = np.array(self._variables.getAttr('RHS', self._variables.getConstrs()))
+
+        rows, cols, values, senses, rhs = [], [], [], [], []
+        offset = 0
+        for A, x, sense, b in self._blocks:
+            if A is None:
+                index = np.fromiter((c.index for c in x), dtype=np.int64, count=len(x))
+                A = linearized[index].tocoo()
+                rows.append(A.row + offset)
+                cols.append(A.col)
+                values.append(A.data)
+                senses.append(linearized_sense[index])
+                rhs.append(linearized_rhs[index])
+                offset += A.shape[0]
+                continue
+            index = np.fromiter((v.index for v in x), dtype=np.int64, count=len(x))
+            rows.append(A.row + offset)
+            cols.append(index[A.col])
+            values.append(A.data)
+            senses.append(np.broadcast_to(np.asarray(sense), (A.shape[0],)))
+            rhs.append(b)
+            offset += A.shape[0]
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        values = np.concatenate(values) if values else np.zeros(0)
+
+        if self._changes:
+            changes = {(row, var.index): value for row, var, value in self._changes}
+            changed = np.array(list(changes.keys()), dtype=np.int64).reshape(-1, 2)
+            keep = ~np.isin(rows * n + cols, changed[:, 0] * n + changed[:, 1])
+            rows = np.concatenate([rows[keep], changed[:, 0]])
+            cols = np.concatenate([cols[keep], changed[:, 1]])
+            values = np.concatenate([values[keep], np.fromiter(changes.values(), dtype=np.float64)])
+
+        A = sp.csr_matrix((values, (rows, cols)), shape=(self._num_rows, n))
+        A.eliminate_zeros()
+        sense = np.concatenate(senses) if senses else np.zeros(0, dtype='<U1')
+        rhs = np.concatenate(rhs) if rhs else np.zeros(0)
+        if self._removed:
+            keep = np.ones(self._num_rows, dtype=bool)
+            keep[self._removed] = False
+            A, sense, rhs = A[keep], sense[keep], rhs[keep]
+
+        variables = self._variables.getVars()
+        c = np.array(self._variables.getAttr('Obj', variables))
+        Q = sp.csr_matrix(self._variables.getQ())
+        const = self._variables.ObjCon
+        costs = getObjectiveRegistry(self).costs
+        if costs:
+            index = np.concatenate([np.fromiter((v.index for v in cost.variables), dtype=np.int64, count=len(cost.variables)) for cost in costs])
+            q = np.concatenate([cost.q for cost in costs])
+            c = c + np.bincount(index, weights=np.concatenate([cost.c for cost in costs]), minlength=n)
+            Q = (Q + sp.csr_matrix((q, (index, index)), shape=(n, n))).tocsr()
+            Q.eliminate_zeros()
+            const += sum(cost.constant for cost in costs)
+        return CanonicalProblem(
+            A, sense, rhs,
+            lb=np.array(self._variables.getAttr('LB', variables)),
+            ub=np.array(self._variables.getAttr('UB', variables)),
+            c=c,
+            Q=Q,
+            const=const,
+            vtype=np.array(self._variables.getAttr('VType', variables)),
+            names=self._variables.getAttr('VarName', variables),
+        )
@@ -1,3 +1,7 @@
+import numpy as np
+import gurobipy as gp
+from Model_Build import getSolution, cachedIndex
+
 class EConnection:
     """A class that represent the flow from a node to a line
 
@@ -16,7 +20,9 @@ class EConnection:
 
     def _init_problem(self, model, time_horizon):
         """Initialize the variables beloinging to the line class that are importatn for the optimization model. """
+        self.model = model
         self._power = model.addVars(time_horizon,lb = -100, name=f"{self.name}_Variable")
+        self._index = None
 
 
     @property
@@ -25,19 +31,25 @@ class EConnection:
         terminal."""
         return self._power
     
+    @property
+    def powerMVar(self):
+        """Power variables of this terminal as a matrix variable, ordered in time"""
+        return gp.MVar.fromlist(list(self._power.values()))
+
     @property
     def powerValues(self):
         """Power send (positive value) or received (negative value) at this
-        terminal."""
-        return [var.x for var in self._power.values()]
+        terminal, a view into the solution arrays of the model."""
+        self._index = cachedIndex(self._index, self._power)
+        return getSolution(self.model).X[self._index]
 
     def getTotalPayment(self):
         """Method to get the weighted sum of values using the coefficients from C"""
-        return sum(p * marginal_cost for p, marginal_cost in zip(self.powerValues, self.network.dual))
+        return float(np.dot(self.powerValues, self.network.dual))
 
     def getHourlyPayment(self):
         """Method to get the weighted sum of values using the coefficients from C"""
-        return [p * marginal_cost for p, marginal_cost in zip(self.powerValues, self.network.dual)]
+        return self.powerValues * np.asarray(self.network.dual)
     
 
     def set_network(self, network):
@@ -70,7 +82,9 @@ class HConnection:
 
     def _init_problem(self, model, time_horizon):
         """Initialize the variables beloinging to the line class that are importatn for the optimization model. """
+        self.model = model
         self._heat = model.addVars(time_horizon,lb=-100,  name=f"{self.name}_Variable")
+        self._index = None
 
 
     @property
@@ -83,16 +97,17 @@ class HConnection:
     def heatValues(self):
         """Power send (positive value) or received (negative value) at this
         terminal."""
-        return [var.X for var in self._heat.values()]
+        self._index = cachedIndex(self._index, self._heat)
+        return getSolution(self.model).X[self._index]
     
 
     def getTotalPayment(self):
         """Method to get the weighted sum of values using the coefficients from C"""
-        return sum(p * marginal_cost for p, marginal_cost in zip(self.heatValues, self.network.dual))
+        return float(np.dot(self.heatValues, self.network.dual))
 
     def getHourlyPayment(self):
         """Method to get the weighted sum of values using the coefficients from C"""
-        return [p * marginal_cost for p, marginal_cost in zip(self.heatValues, self.network.dual)]
+        return self.heatValues * np.asarray(self.network.dual)
     
     def set_network(self, network):
         """Setter function that automatically sets the corresponding network to the line once the line is initialized"""
@@ -1,7 +1,34 @@
 import numpy as np 
 import gurobipy as gp 
-import pandas as pd
+import scipy.sparse as sp
 from Connections_NA import EConnection
+from Profiles import getProfile
+from Model_Build import getObjectiveRegistry, updateModel, QuadraticCost
+
+
+def useMatrixAPI(model, enabled=True):
+    """Selects the matrix API build path for all devices that are created on this model afterwards"""
+    model._matrix_api = enabled
+
+
+def identityMatrix(n, scale=1):
+    """Sparse n x n identity matrix multiplied by scale"""
+    return scale * sp.identity(n, format='csr')
+
+
+def differenceMatrix(n, scale=1):
+    """Sparse (n-1) x n matrix of which row t-1 gives scale * (x[t] - x[t-1])"""
+    return scale * sp.diags([-np.ones(n - 1), np.ones(n - 1)], [0, 1], shape=(n - 1, n), format='csr')
+
+
+def recursionMatrix(n):
+    """Sparse n x n matrix with row 0 giving x[0] and row t giving x[t] - x[t-1]"""
+    return sp.diags([np.ones(n), -np.ones(n - 1)], [0, -1], shape=(n, n), format='csr')
+
+
+def initialMatrix(n, scale=1):
+    """Sparse 1 x n matrix that selects scale * x[0]"""
+    return sp.csr_matrix(([scale], ([0], [0])), shape=(1, n))
 
 
 
@@ -10,6 +37,7 @@ class Device:
         self.name = type(self).__name__ if name is None else name
         self.Econnections = Econnections
         self.model = model
+        self.matrixAPI = getattr(model, '_matrix_api', False)
         if Econnections is not None: 
             for Econnection in Econnections:
                 Econnection._init_problem(self.model, len(T))
@@ -27,12 +55,7 @@ class Device:
     
     def hourlyPayment(self):
         """Network optimization results. Print here the power output and the payment scheme"""
-        hourlyPayment = [0] * len(self.Econnections[0].getHourlyPayment())
-        if self.Econnections is not None: 
-            for c in self.Econnections:
-                hourlyPay = c.getHourlyPayment()
-                hourlyPayment = [sum_val + hourlyPay for sum_val, hourlyPay in zip(hourlyPayment, hourlyPay)]     
-        return hourlyPayment
+        return sum(c.getHourlyPayment() for c in self.Econnections)
 
 #########################################################################################################################################
 
@@ -74,13 +97,22 @@ class CHP(Device):
         powerVar = self.Econnections[0].powerVariables
         #set new variable, fuel burned for heat call it q
 
-        self.objective  = gp.quicksum(self.alpha * ((-powerVar[t] - self.operating_point) * (-powerVar[t] - self.operating_point)) - self.beta * powerVar[t] + self.gamma for t in self.T)          #+ self.beta_q * heatVar[t] + self.gamma_q  for t in self.T)
-        self.objective  += gp.quicksum( -(self.beta/2) * self.boiler[t]  for t in self.T)  
-        self.model.setObjective(self.model.getObjective() + self.objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        if self.matrixAPI:
+            n = len(self.T)
+            self.objective = QuadraticCost([powerVar[t] for t in self.T] + [self.boiler[t] for t in self.T],
+                                           q=np.repeat([self.alpha, 0], n),
+                                           c=np.repeat([2 * self.alpha * self.operating_point - self.beta, -self.beta/2], n),
+                                           constant=n * (self.alpha * self.operating_point**2 + self.gamma))
+        else:
+            self.objective  = gp.quicksum(self.alpha * ((-powerVar[t] - self.operating_point) * (-powerVar[t] - self.operating_point)) - self.beta * powerVar[t] + self.gamma for t in self.T)          #+ self.beta_q * heatVar[t] + self.gamma_q  for t in self.T)
+            self.objective  += gp.quicksum( -(self.beta/2) * self.boiler[t]  for t in self.T)  
+        getObjectiveRegistry(self.model).register(self, self.objective)
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            self._setMatrixConstraints()
+            return
         powerVar = self.Econnections[0].powerVariables
         heatVar = self.Econnections[1].powerVariables
 
@@ -104,24 +136,50 @@ class CHP(Device):
         if self.power_init is not None:
             self.model.addConstr(-powerVar[0] == self.power_init)  
 
-        self.model.update()
+        updateModel(self.model)
+
+    def _setMatrixConstraints(self):
+        """Sets the same constraints as setConstraints through the matrix API"""
+        n = len(self.T)
+        power = list(self.Econnections[0].powerVariables.values())
+        heat = list(self.Econnections[1].powerVariables.values())
+        boiler = list(self.boiler.values())
+
+        self.model.addMConstr(sp.hstack([identityMatrix(n, -1), identityMatrix(n, -1/2)], format='csr'), power + boiler, gp.GRB.LESS_EQUAL, np.full(n, self.power_max))
+
+        self.model.addMConstr(identityMatrix(n, -1), power, gp.GRB.GREATER_EQUAL, np.full(n, self.power_min))
+        self.model.addMConstr(identityMatrix(n, -1), boiler, gp.GRB.GREATER_EQUAL, np.full(n, self.power_min))
+
+        # With dissipation
+        self.model.addMConstr(sp.hstack([identityMatrix(n), identityMatrix(n, -1), identityMatrix(n, -1)], format='csr'), heat + power + boiler, gp.GRB.EQUAL, np.zeros(n))
+
+        if self.ramp_max is not None: 
+            self.model.addMConstr(differenceMatrix(n, -1), power, gp.GRB.LESS_EQUAL, np.full(n - 1, self.ramp_max))
+            self.model.addMConstr(differenceMatrix(n, -1/2), boiler, gp.GRB.LESS_EQUAL, np.full(n - 1, self.ramp_max))
+
+        if self.ramp_min is not None:
+            self.model.addMConstr(differenceMatrix(n, -1), power, gp.GRB.GREATER_EQUAL, np.full(n - 1, self.ramp_min))
+            self.model.addMConstr(differenceMatrix(n, -1/2), boiler, gp.GRB.GREATER_EQUAL, np.full(n - 1, self.ramp_min))
+
+        if self.power_init is not None:
+            self.model.addMConstr(initialMatrix(n, -1), power, gp.GRB.EQUAL, np.array([self.power_init]))
+
+        updateModel(self.model)
 
     def setVariables(self):
         """Sets the Variables of the optimization model"""
         self.boiler = self.model.addVars(self.T, lb = -100)
-        self.model.update()
+        updateModel(self.model)
 
     def getTotalOpex(self):
-        elec_opex = sum(self.alpha * x * x- self.beta * x + self.gamma  for x in self.Econnections[0].powerValues)
-        heat_opex = sum((-self.beta/2) * var.x for var in self.boiler.values())
-        total_sum = elec_opex + heat_opex
-        return total_sum
+        return float(np.sum(self.getHourlyOpex()))
 
     def getHourlyOpex(self):
-        hourly_elec_opex = [self.alpha * x * x- self.beta * x + self.gamma for x in self.Econnections[0].powerValues]
-        hourly_heat_opex = [(-1/2)* self.beta * var.x  for var in self.boiler.values()]
-        hourly_opex  = [x + y for x, y in zip(hourly_elec_opex, hourly_heat_opex)]
-        return hourly_opex
+        x = self.Econnections[0].powerValues
+        boiler = np.asarray(self.model.getAttr('X', list(self.boiler.values())))
+        hourly_elec_opex = self.alpha * x * x- self.beta * x + self.gamma
+        hourly_heat_opex = (-1/2)* self.beta * boiler
+        return hourly_elec_opex + hourly_heat_opex
 
 
 
@@ -162,13 +220,19 @@ class Generator(Device):
 
     def _updateObjective(self):
         powerVar   = self.Econnections[0].powerVariables
-        self.objective  = gp.quicksum(self.alpha * ((-powerVar[t] - self.operating_point) * (-powerVar[t] - self.operating_point)) - self.beta * powerVar[t] + self.gamma for t in self.T)
-        self.model.setObjective(self.model.getObjective() + self.objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        if self.matrixAPI:
+            self.objective = QuadraticCost([powerVar[t] for t in self.T], q=self.alpha, c=2 * self.alpha * self.operating_point - self.beta,
+                                           constant=len(self.T) * (self.alpha * self.operating_point**2 + self.gamma))
+        else:
+            self.objective  = gp.quicksum(self.alpha * ((-powerVar[t] - self.operating_point) * (-powerVar[t] - self.operating_point)) - self.beta * powerVar[t] + self.gamma for t in self.T)
+        getObjectiveRegistry(self.model).register(self, self.objective)
 
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            self._setMatrixConstraints()
+            return
         powerVar = self.Econnections[0].powerVariables
 
         self.model.addConstrs(-powerVar[t] <=  self.power_max for t in self.T)
@@ -181,18 +245,32 @@ class Generator(Device):
         if self.power_init is not None:
             self.model.addConstr(-powerVar[0] == self.power_init)  
 
+    def _setMatrixConstraints(self):
+        """Sets the same constraints as setConstraints through the matrix API"""
+        n = len(self.T)
+        power = list(self.Econnections[0].powerVariables.values())
+
+        self.model.addMConstr(identityMatrix(n, -1), power, gp.GRB.LESS_EQUAL, np.full(n, self.power_max))
+        self.model.addMConstr(identityMatrix(n, -1), power, gp.GRB.GREATER_EQUAL, np.full(n, self.power_min))
+
+        if self.ramp_max is not None: 
+            self.model.addMConstr(differenceMatrix(n, -1), power, gp.GRB.LESS_EQUAL, np.full(n - 1, self.ramp_max))
+        if self.ramp_min is not None:
+            self.model.addMConstr(differenceMatrix(n, -1), power, gp.GRB.GREATER_EQUAL, np.full(n - 1, self.ramp_min))
+        if self.power_init is not None:
+            self.model.addMConstr(initialMatrix(n, -1), power, gp.GRB.EQUAL, np.array([self.power_init]))
+
     def setVariables(self):
         """Sets the Variables of the optimization model"""
         pass
 
 
     def getTotalOpex(self):
-        total_sum = sum(self.alpha * x * x- self.beta * x + self.gamma for x in self.Econnections[0].powerValues)
-        return total_sum
+        return float(np.sum(self.getHourlyOpex()))
 
     def getHourlyOpex(self):
-        hourly_opex = [self.alpha * x * x- self.beta * x + self.gamma for x in self.Econnections[0].powerValues]
-        return hourly_opex
+        x = self.Econnections[0].powerValues
+        return self.alpha * x * x- self.beta * x + self.gamma
 
 #########################################################################################################################################
 
@@ -215,24 +293,23 @@ class Renewable(Device):
         self.setConstraints()
 
     def determinePowerGeneration(self):
-        df = pd.read_excel('Renewable_potential.xlsx')
         if self.technology == 'Wind':
             column_name = 'Wind_potential'
         elif self.technology == 'PV':
             column_name  = 'PV_potential'
         else:
             print("No valid technology")
-        normalized_power_potential = df[column_name].tolist()
+        normalized_power_potential = getProfile('Renewable_potential.xlsx', column_name, self.T)
         # Calculate real power based on normalized load profile and annual power demand
-        real_power = [x * self.install_cap for x in normalized_power_potential]
+        real_power = np.asarray(normalized_power_potential, dtype=np.float64) * self.install_cap
         return real_power
     
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
+        powerVar = list(self.Econnections[0].powerVariables.values())
 
         # With Power Dissipation
-        self.model.addConstrs(-powerVar[t] ==  self.power_available[t] for t in self.T)
+        self.model.addMConstr(identityMatrix(len(self.T), -1), powerVar, gp.GRB.EQUAL, self.power_available[self.T])
         
         # Without Power Dissipation
         # self.model.addConstrs(-powerVar[t] <=  self.power_available[t] for t in self.T)
@@ -256,22 +333,21 @@ class FixedLoad(Device):
         self.buildingType = buildingType
         self.annualDemand = annualDemand
         self.power = self.determineLoadProfile()
-        assert all(item > 0 for item in self.power)
+        assert np.all(self.power > 0)
 
         self.setConstraints()
 
     def determineLoadProfile(self):
-        df = pd.read_excel('load_profiles_normalized.xlsx')
-        normalized_power = df[self.buildingType].tolist()
+        normalized_power = getProfile('load_profiles_normalized.xlsx', self.buildingType, self.T)
         # Calculate real power based on normalized load profile and annual power demand
-        real_power = [x * self.annualDemand for x in normalized_power]
+        real_power = np.asarray(normalized_power, dtype=np.float64) * self.annualDemand
         return real_power
     
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
+        powerVar = list(self.Econnections[0].powerVariables.values())
 
-        self.model.addConstrs(powerVar[t] ==  self.power[t] for t in self.T)
+        self.model.addMConstr(identityMatrix(len(self.T)), powerVar, gp.GRB.EQUAL, self.power[self.T])
     
 #########################################################################################################################################
 
@@ -289,23 +365,22 @@ class ThermalLoad(Device):
         self.heatingType = heatingType
         self.numberHouseholds = numberHouseholds
         self.power = self.determineLoadProfile()
-        assert all(item >= 0 for item in self.power)
+        assert np.all(self.power >= 0)
         assert self.heatingType in ['HP', 'Heating']
 
         self.setConstraints()
 
     def determineLoadProfile(self):
-        df = pd.read_excel('ThermalLoadHousehold.xlsx')
-        ThermalDemand = df[self.heatingType].tolist()
+        ThermalDemand = getProfile('ThermalLoadHousehold.xlsx', self.heatingType, self.T)
         # Calculate real power based on normalized load profile and annual power demand
-        real_demand = [x * self.numberHouseholds for x in ThermalDemand]
+        real_demand = np.asarray(ThermalDemand, dtype=np.float64) * self.numberHouseholds
         return real_demand
     
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
+        powerVar = list(self.Econnections[0].powerVariables.values())
 
-        self.model.addConstrs(powerVar[t] ==  self.power[t] for t in self.T)
+        self.model.addMConstr(identityMatrix(len(self.T)), powerVar, gp.GRB.EQUAL, self.power[self.T])
     
 
 #########################################################################################################################################
@@ -323,12 +398,17 @@ class TransmissionLine(Device):
 
     def _updateObjective(self):
         powerVar   = self.Econnections[0].powerVariables
-        self.objective  = gp.quicksum(self.alpha * (powerVar[t] * powerVar[t])  for t in self.T)
-        self.model.setObjective(self.model.getObjective() + self.objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        if self.matrixAPI:
+            self.objective = QuadraticCost([powerVar[t] for t in self.T], q=self.alpha)
+        else:
+            self.objective  = gp.quicksum(self.alpha * (powerVar[t] * powerVar[t])  for t in self.T)
+        getObjectiveRegistry(self.model).register(self, self.objective)
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            self._setMatrixConstraints()
+            return
         powerVar_1 = self.Econnections[0].powerVariables
         powerVar_2 = self.Econnections[1].powerVariables
 
@@ -337,6 +417,16 @@ class TransmissionLine(Device):
             self.model.addConstrs((powerVar_1[t] - powerVar_2[t]) / 2 <= self.power_max for t in self.T)
             self.model.addConstrs((powerVar_2[t] - powerVar_1[t]) / 2 <= self.power_max for t in self.T)
 
+    def _setMatrixConstraints(self):
+        """Sets the same constraints as setConstraints through the matrix API"""
+        n = len(self.T)
+        power = list(self.Econnections[0].powerVariables.values()) + list(self.Econnections[1].powerVariables.values())
+
+        self.model.addMConstr(sp.hstack([identityMatrix(n), identityMatrix(n)], format='csr'), power, gp.GRB.EQUAL, np.zeros(n))
+        if self.power_max is not None:
+            self.model.addMConstr(sp.hstack([identityMatrix(n, 1/2), identityMatrix(n, -1/2)], format='csr'), power, gp.GRB.LESS_EQUAL, np.full(n, self.power_max))
+            self.model.addMConstr(sp.hstack([identityMatrix(n, -1/2), identityMatrix(n, 1/2)], format='csr'), power, gp.GRB.LESS_EQUAL, np.full(n, self.power_max))
+
 
 
 #########################################################################################################################################
@@ -369,6 +459,9 @@ class Storage(Device):
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            self._setMatrixConstraints()
+            return
         powerVar = self.Econnections[0].powerVariables
 
         if self.discharge_max is not None: 
@@ -384,6 +477,26 @@ class Storage(Device):
         self.model.addConstrs(self.energy[t] >= 0 for t in self.T ) 
         self.model.addConstrs(self.energy[t] <= self.energy_max for t in self.T ) 
 
+    def _setMatrixConstraints(self):
+        """Sets the same constraints as setConstraints through the matrix API"""
+        n = len(self.T)
+        power = list(self.Econnections[0].powerVariables.values())
+        energy = list(self.energy.values())
+
+        if self.discharge_max is not None: 
+            self.model.addMConstr(identityMatrix(n), power, gp.GRB.GREATER_EQUAL, np.full(n, -self.discharge_max))
+
+        if self.charge_max is not None: 
+            self.model.addMConstr(identityMatrix(n), power, gp.GRB.LESS_EQUAL, np.full(n, self.charge_max))
+
+        # energy[0] - power[0] == energy_init and energy[t] - energy[t-1] - power[t] == 0
+        rhs = np.zeros(n)
+        rhs[0] = self.energy_init
+        self.model.addMConstr(sp.hstack([recursionMatrix(n), identityMatrix(n, -1)], format='csr'), energy + power, gp.GRB.EQUAL, rhs)
+
+        self.model.addMConstr(identityMatrix(n), energy, gp.GRB.GREATER_EQUAL, np.zeros(n))
+        self.model.addMConstr(identityMatrix(n), energy, gp.GRB.LESS_EQUAL, np.full(n, self.energy_max))
+
     def setVariables(self):
         """Sets the Variables of the optimization model"""
         self.energy = self.model.addVars(self.T)
@@ -402,6 +515,10 @@ class PowerDissipation(Device):
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            power = list(self.Econnections[0].powerVariables.values())
+            self.model.addMConstr(identityMatrix(len(self.T)), power, gp.GRB.GREATER_EQUAL, np.zeros(len(self.T)))
+            return
         powerVar = self.Econnections[0].powerVariables
         self.model.addConstrs(powerVar[t] >= 0  for t in self.T)
 
@@ -419,6 +536,10 @@ class HeatDissipation(Device):
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            heat = list(self.Econnections[0].powerVariables.values())
+            self.model.addMConstr(identityMatrix(len(self.T)), heat, gp.GRB.GREATER_EQUAL, np.zeros(len(self.T)))
+            return
         heatVar = self.Econnections[0].powerVariables
         self.model.addConstrs(heatVar[t] >= 0  for t in self.T)
 
@@ -436,23 +557,27 @@ class ExternalPower(Device):
 
     def _updateObjective(self):
         powerVar   = self.Econnections[0].powerVariables
-        self.objective  = gp.quicksum(-self.price * powerVar[t] for t in self.T)
-        self.model.setObjective(self.model.getObjective() + self.objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        if self.matrixAPI:
+            self.objective = QuadraticCost([powerVar[t] for t in self.T], c=-self.price)
+        else:
+            self.objective  = gp.quicksum(-self.price * powerVar[t] for t in self.T)
+        getObjectiveRegistry(self.model).register(self, self.objective)
 
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if self.matrixAPI:
+            power = list(self.Econnections[0].powerVariables.values())
+            self.model.addMConstr(identityMatrix(len(self.T)), power, gp.GRB.LESS_EQUAL, np.zeros(len(self.T)))
+            return
         powerVar = self.Econnections[0].powerVariables
         self.model.addConstrs(powerVar[t] <= 0  for t in self.T)
     
     def getTotalOpex(self):
-        total_sum = sum(-self.price * x for x in self.Econnections[0].powerValues)
-        return total_sum
+        return float(np.sum(self.getHourlyOpex()))
 
     def getHourlyOpex(self):
-        hourly_opex = [-self.price * x for x in self.Econnections[0].powerValues]
-        return hourly_opex
+        return -self.price * self.Econnections[0].powerValues
 
 #########################################################################################################################################
 
@@ -467,5 +592,5 @@ class FixedLoadTest(Device):
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
-        self.model.addConstrs(powerVar[t] ==  self.power[t] for t in self.T)
+        powerVar = list(self.Econnections[0].powerVariables.values())
+        self.model.addMConstr(identityMatrix(len(self.T)), powerVar, gp.GRB.EQUAL, np.asarray(self.power, dtype=np.float64)[self.T])
@@ -0,0 +1,189 @@
+import io
+import time
+import sqlite3
+import hashlib
+import numpy as np
+from Model_Build import optimizeModel, getObjectiveRegistry
+from Investment_Heuristics import attachCandidate, detachCandidate
+from Candidate_Pool import describeCandidate
+
+
+def systemFingerprint(model):
+    """Returns a hash of the structure and data of the model, the same system built again gives the same hash
+
+    Detached candidates keep their variables and constraints in the model, so the benchmark system is fingerprinted
+    before any candidate is created.
+    """
+    getObjectiveRegistry(model).assemble()
+    model.update()
+    digest = hashlib.sha256()
+    A = model.getA().tocsr()
+    for array in (A.indptr, A.indices, A.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    for attr in ('RHS', 'Sense'):
+        digest.update(repr(model.getAttr(attr, model.getConstrs())).encode())
+    for attr in ('LB', 'UB', 'Obj'):
+        digest.update(np.asarray(model.getAttr(attr, model.getVars()), dtype=np.float64).tobytes())
+    Q = model.getQ().tocoo()
+    for array in (Q.row, Q.col, Q.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(repr(model.ObjCon).encode())
+    return digest.hexdigest()
+
+
+def attachedCandidates(nets):
+    """Returns the candidate devices that are currently attached to the networks"""
+    candidates = []
+    for network in nets:
+        for connection in network.Econnections:
+            device = connection.device
+            if hasattr(device, 'investment_cost') and device not in candidates:
+                candidates.append(device)
+    return candidates
+
+
+def configurationKey(base_fingerprint, candidates):
+    """Returns the cache key of the base system with the candidates attached, independent of their order"""
+    descriptors = sorted(repr(sorted(describeCandidate(p).items())) for p in candidates)
+    return hashlib.sha256((base_fingerprint + '|' + '|'.join(descriptors)).encode()).hexdigest()
+
+#########################################################################################################################################
+
+class EvaluationCache:
+    """Disk-backed cache of the objective value, and optionally the per-net duals, of system configurations
+
+    Entries are evicted least recently used first once the stored size exceeds max_bytes.
+
+    Attributes:
+        hits (int): Number of lookups answered from the cache in this session
+        misses (int): Number of lookups that were not in the cache in this session
+    """
+
+    def __init__(self, path='evaluations.sqlite', max_bytes=None):
+        """Initialize the cache, the database file is created when it does not exist. """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS evaluations ("
+            "key TEXT PRIMARY KEY, objective REAL, duals BLOB, size INTEGER, created REAL, last_used REAL)"
+        )
+        self.connection.commit()
+
+    def get(self, key):
+        """Returns (objective, duals) of the configuration, or None when it was not evaluated before"""
+        row = self.connection.execute("SELECT objective, duals FROM evaluations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute("UPDATE evaluations SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        duals = None if row[1] is None else np.load(io.BytesIO(row[1]))
+        return row[0], duals
+
+    def put(self, key, objective, duals=None):
+        """Stores the objective value, and the duals as an array with one row per net, of the configuration"""
+        blob = None
+        if duals is not None:
+            buffer = io.BytesIO()
+            np.save(buffer, np.asarray(duals, dtype=np.float64))
+            blob = buffer.getvalue()
+        size = len(key) + 8 + (0 if blob is None else len(blob))
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO evaluations (key, objective, duals, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, objective, blob, size, now, now),
+        )
+        self.connection.commit()
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def evict(self, max_bytes):
+        """Removes the least recently used entries until the stored size is at most max_bytes"""
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM evaluations").fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        removed = 0
+        for key, size in self.connection.execute("SELECT key, size FROM evaluations ORDER BY last_used").fetchall():
+            if total <= max_bytes:
+                break
+            self.connection.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        self.connection.commit()
+        return removed
+
+    def stats(self):
+        """Returns the hit rate of this session and the size of the cache"""
+        entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM evaluations").fetchone()
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries, 'bytes': size}
+
+    def clear(self):
+        """Removes all entries and resets the counters"""
+        self.connection.execute("DELETE FROM evaluations")
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.connection.close()
+
+#########################################################################################################################################
+
+class CachedEvaluator:
+    """Candidate evaluator that answers configurations from an EvaluationCache and solves only the new ones
+
+    Can be passed as evaluator to createDeviceValue and lazyGreedyHeuristic. The configuration is the base
+    system plus every candidate attached to the networks, so candidates selected earlier are part of the key.
+
+    Args:
+        cache (EvaluationCache): Cache shared between sessions and heuristics
+        model (gp.Model): Model of the system the candidates were created on
+        base_fingerprint (str): systemFingerprint of the benchmark system, taken before any candidate was created
+        evaluator (WarmStartEvaluator): Solves the configurations that are not cached, cold solves when None
+        store_duals (bool): Also stores the dual vectors of all nets
+    """
+
+    def __init__(self, cache, model, base_fingerprint, evaluator=None, store_duals=False):
+        """Initialize the evaluator. """
+        self.cache = cache
+        self.model = model
+        self.evaluator = evaluator
+        self.store_duals = store_duals
+        self.base_fingerprint = base_fingerprint
+
+    def evaluate(self, p, nets):
+        """Returns the objective value of the current configuration with the candidate attached"""
+        key = configurationKey(self.base_fingerprint, attachedCandidates(nets) + [p])
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0]
+
+        duals = None
+        if self.evaluator is not None and not self.store_duals:
+            total_cost = self.evaluator.evaluate(p, nets)
+        else:
+            attachCandidate(p, nets)
+            optimizeModel(self.model)
+            total_cost = self.model.ObjVal
+            if self.store_duals:
+                duals = np.vstack([net.dualValues for net in nets])
+            detachCandidate(p, nets)
+        self.cache.put(key, total_cost, duals)
+        return total_cost
+
+    def evaluateCurrent(self, nets):
+        """Returns the objective value of the configuration as it is attached now, as in solutionRetriever"""
+        key = configurationKey(self.base_fingerprint, attachedCandidates(nets))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0]
+        optimizeModel(self.model)
+        duals = np.vstack([net.dualValues for net in nets]) if self.store_duals else None
+        self.cache.put(key, self.model.ObjVal, duals)
+        return self.model.ObjVal
@@ -0,0 +1,401 @@
+import time
+import heapq
+import numpy as np
+import gurobipy as gp
+from Model_Build import optimizeModel
+
+
+def candidateConnections(p, nets):
+    """Returns the (network, connection) pairs through which the candidate is attached to the system"""
+    if p.name == "Transmission Line":
+        return [(nets[p.net_from], p.Econnections[0]), (nets[p.net_to], p.Econnections[1])]
+    return [(nets[p.net_from], p.Econnections[0])]
+
+
+def attachCandidate(p, nets):
+    """Adds the connections of the candidate to their networks"""
+    for network, connection in candidateConnections(p, nets):
+        network.addEconnection(connection)
+
+
+def detachCandidate(p, nets):
+    """Removes the connections of the candidate from their networks"""
+    for network, connection in candidateConnections(p, nets):
+        network.removeEconnection(connection)
+
+
+def candidateCapacity(p):
+    """Returns the size of the candidate, installed capacity, energy capacity or line capacity"""
+    if p.name in ["Renewable PV", "Renewable Wind"]:
+        return p.install_cap
+    elif p.name == "Storage":
+        return p.energy_max
+    elif p.name == "Transmission Line":
+        return p.power_max
+    raise ValueError(f"Unknown candidate {p.name}")
+
+
+def assignGroups(potential_items):
+    """Returns the multiple choice group of every candidate
+
+    Renewables are grouped per net, storages per net shifted by 10, consecutive lines between the same
+    pair of nets share a group starting from 21.
+    """
+    groups = []
+    previous = None
+    for p in potential_items:
+        if p.name in ["Renewable PV", "Renewable Wind"]:
+            group = p.net_from
+        elif p.name == "Storage":
+            group = p.net_from + 10
+        elif p.name == "Transmission Line":
+            if previous is not None and previous[0] == (p.net_from, p.net_to):
+                group = previous[1]
+            else:
+                group = max([21] + [g + 1 for g in groups])
+            previous = ((p.net_from, p.net_to), group)
+        else:
+            raise ValueError(f"Unknown candidate {p.name}")
+        groups.append(group)
+    return groups
+
+
+def createDeviceValue(potential_items, benchmark_cost, nets, evaluator=None):
+    """Returns (p, name, group, capacity, price, total_saving) for every candidate, each evaluated on its own
+
+    Args:
+        potential_items (list): Heuristic devices created on the model of the system, not attached to a network
+        benchmark_cost (float): Objective value of the system without candidates
+        nets (list): Networks of the system, indexed by net_from and net_to of the candidates
+        evaluator (WarmStartEvaluator): Evaluates the candidates from the benchmark basis, cold solves when None
+    """
+    results = []
+    for p, group in zip(potential_items, assignGroups(potential_items)):
+        total_cost = evaluateCandidate(p, nets, evaluator)
+        total_saving = benchmark_cost - total_cost
+        results.append((p, p.name, group, candidateCapacity(p), p.investment_cost, total_saving))
+    return results
+
+
+def solutionRetriever(sorted_list, index_list, nets):
+    """Attaches the selected candidates to the system and returns the resulting objective value"""
+    filtered_tuples = [sorted_list[idx] for idx in index_list]
+    for i in filtered_tuples:
+        attachCandidate(i[0], nets)
+    model = filtered_tuples[0][0].getModel() if filtered_tuples else nets[0].model
+    optimizeModel(model)
+    return model.ObjVal
+
+
+def estimateCandidateValues(potential_items, nets, hours_per_day=24):
+    """Returns a first-order estimate of the saving of every candidate from the duals of the last benchmark solve
+
+    Attaching a connection with power p[t] to a net changes the cost by about -sum_t dual[t] * p[t], so
+    renewables are valued at -sum_t dual[t] * power_available[t]. Storage is bounded by one full cycle per day
+    between the cheapest and most expensive hour, lines by their capacity times the hourly price difference.
+    """
+    duals = np.vstack([np.asarray(net.dualValues, dtype=np.float64) for net in nets])
+    prices = -duals
+    estimates = np.zeros(len(potential_items))
+
+    renewables = [i for i, p in enumerate(potential_items) if p.name in ["Renewable PV", "Renewable Wind"]]
+    if renewables:
+        available = np.vstack([potential_items[i].power_available[potential_items[i].T] for i in renewables])
+        rows = np.array([potential_items[i].net_from for i in renewables])
+        estimates[renewables] = np.sum(prices[rows] * available, axis=1)
+
+    storages = [i for i, p in enumerate(potential_items) if p.name == "Storage"]
+    if storages:
+        starts = np.arange(0, prices.shape[1], hours_per_day)
+        daily_spread = np.maximum.reduceat(prices, starts, axis=1) - np.minimum.reduceat(prices, starts, axis=1)
+        rows = np.array([potential_items[i].net_from for i in storages])
+        # A missing rate limit is unlimited, a limit of zero is not
+        rate = np.array([min(np.inf if potential_items[i].charge_max is None else potential_items[i].charge_max,
+                             np.inf if potential_items[i].discharge_max is None else potential_items[i].discharge_max)
+                         for i in storages])
+        cycle = np.minimum([potential_items[i].energy_max for i in storages], rate * hours_per_day / 2)
+        estimates[storages] = cycle * np.sum(daily_spread[rows], axis=1)
+
+    lines = [i for i, p in enumerate(potential_items) if p.name == "Transmission Line"]
+    if lines:
+        rows_from = np.array([potential_items[i].net_from for i in lines])
+        rows_to = np.array([potential_items[i].net_to for i in lines])
+        capacity = np.array([potential_items[i].power_max for i in lines], dtype=np.float64)
+        estimates[lines] = capacity * np.sum(np.abs(prices[rows_from] - prices[rows_to]), axis=1)
+    return estimates
+
+
+def screenCandidates(potential_items, nets, top_k=None, threshold=None):
+    """Ranks the candidates on their estimated saving and returns the ones that pass the screening
+
+    Returns:
+        selected (list): (p, estimate) of the candidates in the top_k and above the threshold, best first
+        ranking (list): (p, estimate) of all candidates, best first
+    """
+    estimates = estimateCandidateValues(potential_items, nets)
+    order = np.argsort(-estimates, kind='stable')
+    ranking = [(potential_items[i], estimates[i]) for i in order]
+    selected = ranking if top_k is None else ranking[:top_k]
+    if threshold is not None:
+        selected = [(p, estimate) for p, estimate in selected if estimate >= threshold]
+    return selected, ranking
+
+
+def createScreenedDeviceValue(potential_items, benchmark_cost, nets, top_k=None, threshold=None, evaluator=None):
+    """createDeviceValue on the candidates that pass the dual price screening
+
+    The duals of the benchmark solve must be available on the networks. Groups are assigned on the full
+    candidate list, so they are the same as without screening.
+
+    Returns:
+        results (list): (p, name, group, capacity, price, total_saving) of the screened candidates
+        report (list): Estimate, actual saving and error of every screened candidate
+    """
+    selected, _ = screenCandidates(potential_items, nets, top_k, threshold)
+    groups = dict(zip(potential_items, assignGroups(potential_items)))
+    results, report = [], []
+    for p, estimate in selected:
+        _, name, _, capacity, price, total_saving = createDeviceValue([p], benchmark_cost, nets, evaluator)[0]
+        results.append((p, name, groups[p], capacity, price, total_saving))
+        report.append({'candidate': name, 'net_from': p.net_from, 'net_to': p.net_to, 'estimate': float(estimate),
+                       'actual': total_saving, 'error': float(estimate) - total_saving})
+    return results, report
+
+def evaluateCandidate(p, nets, evaluator=None):
+    """Returns the objective value of the system with the candidate attached, the candidate is detached again"""
+    if evaluator is not None:
+        return evaluator.evaluate(p, nets)
+    model = p.getModel()
+    attachCandidate(p, nets)
+    optimizeModel(model)
+    total_cost = model.ObjVal
+    detachCandidate(p, nets)
+    return total_cost
+
+
+def returnOnInvestment(saving, investment_cost):
+    """Saving per unit of investment cost, a free candidate that saves anything has an infinite return"""
+    if investment_cost == 0:
+        return np.inf if saving > 0 else 0.0
+    return saving / investment_cost
+
+
+def lazyGreedyHeuristic(potential_items, benchmark_cost, nets, budget, evaluator=None, verbose=False):
+    """Greedy investment selection on return on investment with lazy (CELF) re-evaluation
+
+    Every candidate keeps the ROI of its last evaluation as an upper bound in a priority queue. Only the
+    top candidate is re-evaluated against the current selection, and it is selected once its fresh ROI
+    stays on top. Selected candidates stay attached to their networks. Free candidates that save anything rank
+    first.
+
+    Returns:
+        selected_items (list): Selected candidates in the order they were selected
+        total_cost (float): Objective value of the system with the selected candidates
+    """
+    total_cost = benchmark_cost
+    residual = budget
+    selected_items = []
+    savings = {}
+    heap = []
+    for i, p in enumerate(potential_items):
+        if p.investment_cost <= residual:
+            savings[i] = total_cost - evaluateCandidate(p, nets, evaluator)
+            heapq.heappush(heap, (-returnOnInvestment(savings[i], p.investment_cost), i, 0))
+    evaluations = len(heap)
+
+    while heap:
+        negative_roi, i, evaluated_at = heapq.heappop(heap)
+        p = potential_items[i]
+        if p.investment_cost > residual:
+            continue
+        if evaluated_at < len(selected_items):
+            savings[i] = total_cost - evaluateCandidate(p, nets, evaluator)
+            evaluations += 1
+            heapq.heappush(heap, (-returnOnInvestment(savings[i], p.investment_cost), i, len(selected_items)))
+            continue
+        if -negative_roi <= 0:
+            break
+
+        attachCandidate(p, nets)
+        selected_items.append(p)
+        residual -= p.investment_cost
+        total_cost -= savings[i]
+        if verbose:
+            print(f"Selected {p.name} at net {p.net_from}, saving {savings[i]:.2f}, residual budget {residual}")
+
+    if verbose:
+        print(f"{evaluations} evaluations for {len(potential_items)} candidates")
+    return selected_items, total_cost
+
+def multipleChoiceKnapsack(W, weights, values, groups, scale=1):
+    """Exact multiple choice knapsack, selects at most one item per group within the budget W
+
+    The table is filled group by group on NumPy arrays in O(n * W) time and memory. Non-integer prices are
+    supported by scale, prices are multiplied by it and rounded up while the budget is rounded down, so the
+    selection always fits the budget.
+
+    Returns:
+        value (float): Total value of the selected items
+        sol (list): Indices of the selected items
+    """
+    weights = np.ceil(np.asarray(weights, dtype=np.float64) * scale - 1e-9).astype(np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.asarray(groups)
+    capacity = int(np.floor(W * scale + 1e-9))
+
+    best = np.zeros(capacity + 1)
+    unique_groups = np.unique(groups)
+    choice = np.full((len(unique_groups), capacity + 1), -1, dtype=np.int64)
+    for g, group in enumerate(unique_groups):
+        # best[c] is the highest value within capacity c using the groups handled so far
+        new_best = best.copy()
+        for i in np.flatnonzero(groups == group):
+            w = weights[i]
+            if w > capacity:
+                continue
+            candidate = np.full(capacity + 1, -np.inf)
+            candidate[w:] = best[:capacity + 1 - w] + values[i]
+            better = candidate > new_best
+            new_best[better] = candidate[better]
+            choice[g, better] = i
+        best = new_best
+
+    sol = []
+    c = capacity
+    for g in range(len(unique_groups) - 1, -1, -1):
+        i = choice[g, c]
+        if i >= 0:
+            sol.append(int(i))
+            c -= weights[i]
+    return float(best[capacity]), sorted(sol)
+
+#########################################################################################################################################
+
+class WarmStartEvaluator:
+    """Evaluates candidate systems starting from the basis of the benchmark solution
+
+    Every candidate only changes a few coefficients of the benchmark model, so the simplex basis (VBasis/CBasis)
+    of the benchmark stays close to optimal. When no basis is available, the primal and dual values are
+    passed as PStart/DStart instead.
+
+    With measure_cold every candidate is also solved from scratch, and the records report cold_iterations,
+    cold_runtime and time_saved against that solve. Without it the only cold solve is the one of the benchmark,
+    so the records report benchmark_iterations, benchmark_runtime and time_saved_vs_benchmark instead.
+
+    Attributes:
+        benchmark_cost (float): Objective value of the benchmark system
+        reference (dict): Iterations and runtime of the cold benchmark solve
+        records (list): Iterations, runtime and time saved for every evaluated candidate
+    """
+
+    def __init__(self, model, method=1, measure_cold=False, verbose=False):
+        """Initialize the evaluator for the model of the system
+
+        Args:
+            method (int): Gurobi Method used for all solves, simplex is needed to reuse a basis
+            measure_cold (bool): Also solves every candidate from scratch to measure the exact time saved, otherwise
+                the time saved is relative to the cold benchmark solve
+        """
+        self.model = model
+        self.method = method
+        self.measure_cold = measure_cold
+        self.verbose = verbose
+        self.benchmark_cost = None
+        self.reference = None
+        self.records = []
+        self._variables = None
+        self._constraints = None
+        self._vbasis = None
+        self._cbasis = None
+        self._pstart = None
+        self._dstart = None
+
+    def captureBenchmark(self):
+        """Solves the benchmark system from scratch and stores its basis and primal/dual values"""
+        self.model.setParam('Method', self.method)
+        self.model.reset()
+        optimizeModel(self.model)
+        self.benchmark_cost = self.model.ObjVal
+        self.reference = {'iterations': self._iterations(), 'runtime': self.model.Runtime}
+
+        self._variables = self.model.getVars()
+        self._constraints = self.model.getConstrs()
+        self._pstart = self.model.getAttr('X', self._variables)
+        try:
+            self._dstart = self.model.getAttr('Pi', self._constraints)
+        except gp.GurobiError:
+            self._dstart = None
+        try:
+            self._vbasis = self.model.getAttr('VBasis', self._variables)
+            self._cbasis = self.model.getAttr('CBasis', self._constraints)
+        except gp.GurobiError:
+            self._vbasis = None
+            self._cbasis = None
+        return self.benchmark_cost
+
+    def _iterations(self):
+        return int(self.model.IterCount + self.model.BarIterCount)
+
+    def _applyStart(self):
+        """Passes the benchmark basis, or else the benchmark solution, to the next solve"""
+        if self._vbasis is not None:
+            self.model.setAttr('VBasis', self._variables, self._vbasis)
+            self.model.setAttr('CBasis', self._constraints, self._cbasis)
+        else:
+            self.model.setAttr('PStart', self._variables, self._pstart)
+            if self._dstart is not None:
+                self.model.setAttr('DStart', self._constraints, self._dstart)
+
+    def evaluate(self, p, nets):
+        """Returns the objective value of the benchmark system with the candidate attached"""
+        if self.benchmark_cost is None:
+            self.captureBenchmark()
+        attachCandidate(p, nets)
+
+        cold = None
+        if self.measure_cold:
+            self.model.reset()
+            optimizeModel(self.model)
+            cold = {'iterations': self._iterations(), 'runtime': self.model.Runtime}
+            # Otherwise the warm solve below starts from the optimal solution of the cold solve
+            self.model.reset()
+
+        start = time.perf_counter()
+        self._applyStart()
+        optimizeModel(self.model)
+        wall = time.perf_counter() - start
+        total_cost = self.model.ObjVal
+        detachCandidate(p, nets)
+
+        reference = self.reference if cold is None else cold
+        prefix, saved = self._referenceKeys()
+        record = {
+            'candidate': p.name,
+            'net_from': p.net_from,
+            'net_to': p.net_to,
+            'iterations': self._iterations(),
+            'runtime': self.model.Runtime,
+            'wall': wall,
+            f'{prefix}_iterations': reference['iterations'],
+            f'{prefix}_runtime': reference['runtime'],
+            saved: reference['runtime'] - self.model.Runtime,
+        }
+        self.records.append(record)
+        if self.verbose:
+            print(f"{p.name} at net {p.net_from}: {record['iterations']} iterations "
+                  f"({prefix} {record[f'{prefix}_iterations']}), {saved} {record[saved]:.3f}s")
+        return total_cost
+
+    def _referenceKeys(self):
+        """Record keys of the reference solve, the cold solve of the candidate or else the benchmark solve"""
+        return ('cold', 'time_saved') if self.measure_cold else ('benchmark', 'time_saved_vs_benchmark')
+
+    def summary(self):
+        """Returns the total iterations and time saved over all evaluated candidates, keyed like the records"""
+        prefix, saved = self._referenceKeys()
+        return {
+            'candidates': len(self.records),
+            'iterations': sum(r['iterations'] for r in self.records),
+            f'{prefix}_iterations': sum(r[f'{prefix}_iterations'] for r in self.records),
+            saved: sum(r[saved] for r in self.records),
+        }
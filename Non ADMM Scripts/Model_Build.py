@@ -0,0 +1,288 @@
+import time
+import numpy as np
+import gurobipy as gp
+from gurobipy import GRB
+
+
+class ObjectiveRegistry:
+    """Collects the cost terms of the devices that share a model and sets the model objective once before a solve
+
+    Registering a device only marks its terms as pending, nothing is handed to the model until assemble, which
+    optimizeModel and the flush of a SystemBuilder call. New terms are added to the accumulated objective, the terms
+    of the other devices are never copied again. After a device was dropped or registered again the objective is
+    rebuilt once from the registered terms. Call assemble before a direct model.optimize().
+
+    Attributes:
+        terms (dict): Cost expression or QuadraticCost per registered device
+        assembled (int): Number of times the objective was handed to the model
+    """
+
+    def __init__(self, model):
+        """Initialize an empty registry for the model. """
+        self.model = model
+        self.terms = {}
+        self.assembled = 0
+        self._objective = gp.QuadExpr()
+        self._pending = []
+        self._rebuild = False
+
+    @property
+    def dirty(self):
+        """True when terms were registered or dropped after the last assemble"""
+        return self._rebuild or len(self._pending) > 0
+
+    def register(self, device, expr):
+        """Registers the cost terms of the device, earlier terms of the same device are replaced"""
+        if device in self.terms:
+            self._rebuild = True
+        else:
+            self._pending.append(expr)
+        self.terms[device] = expr
+
+    def drop(self, device):
+        """Removes the cost terms of the device from the objective"""
+        if self.terms.pop(device, None) is not None:
+            self._rebuild = True
+
+    def assemble(self):
+        """Sets the accumulated objective on the model, does nothing when no terms changed"""
+        if not self.dirty:
+            return self._objective
+        if self._rebuild:
+            self._clear()
+            pending = self.terms.values()
+        else:
+            pending = self._pending
+        for expr in pending:
+            self._add(expr)
+        self._pending = []
+        self._rebuild = False
+        self.model.setObjective(self._objective, GRB.MINIMIZE)
+        self.assembled += 1
+        return self._objective
+
+    def _clear(self):
+        self._objective = gp.QuadExpr()
+
+    def _add(self, expr):
+        if isinstance(expr, QuadraticCost):
+            expr = expr.toExpr()
+        self._objective.add(expr)
+
+
+class QuadraticCost:
+    """Separable cost sum(q * x**2 + c * x) + constant over a list of variables, kept as arrays
+
+    Devices on the matrix API build path register their costs in this form. A gp.Model receives them as one
+    expression, a Compiler.CanonicalModel adds the arrays to c and Q directly.
+
+    Attributes:
+        variables (list): Variables of the cost
+        q (np.ndarray): Quadratic coefficient of every variable
+        c (np.ndarray): Linear coefficient of every variable
+        constant (float): Constant part of the cost
+    """
+
+    def __init__(self, variables, q=0, c=0, constant=0):
+        """Initialize the cost, q and c are scalars or one value per variable. """
+        self.variables = list(variables)
+        n = len(self.variables)
+        self.q = np.broadcast_to(np.asarray(q, dtype=np.float64), (n,))
+        self.c = np.broadcast_to(np.asarray(c, dtype=np.float64), (n,))
+        self.constant = float(constant)
+
+    def toExpr(self):
+        """Returns the cost as a gp.QuadExpr"""
+        expr = gp.QuadExpr(gp.LinExpr(self.c.tolist(), self.variables))
+        expr.addTerms(self.q.tolist(), self.variables, self.variables)
+        expr.addConstant(self.constant)
+        return expr
+
+
+def getObjectiveRegistry(model):
+    """Returns the objective registry of the model, creates it on first use"""
+    registry = getattr(model, '_objective_registry', None)
+    if registry is None:
+        registry = ObjectiveRegistry(model)
+        model._objective_registry = registry
+    return registry
+
+
+def updateModel(model):
+    """Processes the pending model changes, unless a SystemBuilder defers them until the end of the build"""
+    builder = getattr(model, '_system_builder', None)
+    if builder is not None:
+        builder.suppressed_updates += 1
+        return
+    model.update()
+
+
+class SystemBuilder:
+    """Build context that suppresses the intermediate model updates and flushes once at the end
+
+    Usage:
+        with SystemBuilder(m) as builder:
+            ... create the devices and networks on m ...
+        print(builder.report())
+
+    Attributes:
+        build_time (float): Seconds spent inside the with block
+        flush_time (float): Seconds spent on the single update and objective assembly at the end
+        suppressed_updates (int): Number of model updates that were deferred
+    """
+
+    def __init__(self, model, verbose=False):
+        """Initialize the build context for the model. """
+        self.model = model
+        self.verbose = verbose
+        self.build_time = 0
+        self.flush_time = 0
+        self.suppressed_updates = 0
+
+    def __enter__(self):
+        self.model._system_builder = self
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.build_time = time.perf_counter() - self._start
+        self.model._system_builder = None
+        if exc_type is None:
+            self.flush()
+            if self.verbose:
+                print(self.report())
+        return False
+
+    def flush(self):
+        """Processes all pending changes and assembles the objective"""
+        start = time.perf_counter()
+        self.model.update()
+        getObjectiveRegistry(self.model).assemble()
+        self.flush_time = time.perf_counter() - start
+
+    @property
+    def total_time(self):
+        return self.build_time + self.flush_time
+
+    def report(self):
+        """Returns a short summary of the build"""
+        return (f"Built in {self.total_time:.3f}s ({self.build_time:.3f}s construction, {self.flush_time:.3f}s flush), "
+                f"{self.suppressed_updates} model updates deferred")
+
+
+def compareBuild(build, model_factory=gp.Model, verbose=False):
+    """Builds the system twice, with immediate and with deferred updates, and returns the time saved
+
+    Args:
+        build (function): Creates the devices and networks on the model passed as its only argument
+        model_factory (function): Returns a new empty model
+        verbose (bool): Also prints the comparison
+    """
+    model = model_factory()
+    start = time.perf_counter()
+    build(model)
+    model.update()
+    getObjectiveRegistry(model).assemble()
+    immediate = time.perf_counter() - start
+    model.dispose()
+
+    model = model_factory()
+    with SystemBuilder(model) as builder:
+        build(model)
+    model.dispose()
+
+    report = {'immediate': immediate, 'deferred': builder.total_time, 'saved': immediate - builder.total_time,
+              'suppressed_updates': builder.suppressed_updates}
+    if verbose:
+        print(f"Immediate updates: {immediate:.3f}s, deferred: {builder.total_time:.3f}s, "
+              f"saved {report['saved']:.3f}s over {builder.suppressed_updates} updates")
+    return report
+
+
+def solveSignature(model):
+    """Returns attributes that Gurobi changes with every solve, so a direct model.optimize() is noticed as well"""
+    signature = [getattr(model, '_solve_count', 0)]
+    for attr in ('NumVars', 'NumConstrs', 'Status', 'SolCount', 'IterCount', 'BarIterCount', 'NodeCount', 'Runtime', 'Work'):
+        try:
+            signature.append(model.getAttr(attr))
+        except (gp.GurobiError, AttributeError):
+            signature.append(None)
+    if signature[4] is not None and signature[4] > 0:
+        signature.append(model.ObjVal)
+    return tuple(signature)
+
+
+class SolutionCache:
+    """Primal and dual values of all variables and constraints of a model, extracted with one getAttr call each
+
+    The arrays are refreshed once per solve, connections and networks read slices of them. A solve is recognized
+    by solveSignature, so solves through optimizeModel and direct calls of model.optimize() both refresh the arrays.
+
+    Attributes:
+        X (np.ndarray): Value of every variable, ordered by variable index
+        Pi (np.ndarray): Dual of every linear constraint, ordered by constraint index, None when not available
+    """
+
+    def __init__(self, model):
+        """Initialize an empty cache for the model. """
+        self.model = model
+        self.signature = None
+        self.X = None
+        self.Pi = None
+
+    def refresh(self):
+        """Extracts the values of the last solve, does nothing when they were already extracted"""
+        signature = solveSignature(self.model)
+        if signature != self.signature:
+            self.X = np.asarray(self.model.getAttr('X'), dtype=np.float64)
+            try:
+                self.Pi = np.asarray(self.model.getAttr('Pi'), dtype=np.float64)
+            except gp.GurobiError:
+                # No duals for MIPs or unsolved models
+                self.Pi = None
+            self.signature = signature
+        return self
+
+
+def getSolution(model):
+    """Returns the solution cache of the model, refreshed for the last solve"""
+    cache = getattr(model, '_solution_cache', None)
+    if cache is None:
+        cache = SolutionCache(model)
+        model._solution_cache = cache
+    return cache.refresh()
+
+
+def indexSlice(objects):
+    """Returns a slice over the model indices of the objects when they are consecutive, else an index array"""
+    index = np.fromiter((o.index for o in objects), dtype=np.int64)
+    if len(index) > 0 and index[-1] - index[0] == len(index) - 1 and np.all(np.diff(index) == 1):
+        return slice(int(index[0]), int(index[-1]) + 1)
+    return index
+
+
+def cachedIndex(index, objects):
+    """Returns the cached indexSlice of the objects (a list or dict of model objects), computed again when it is None
+    or when objects removed from the model shifted the indices since it was computed
+
+    A removal shifts the index of every object after it, so comparing the first and the last object is enough.
+    """
+    if len(objects) == 0:
+        return indexSlice([])
+    if isinstance(objects, dict):
+        first, last = next(iter(objects.values())), objects[next(reversed(objects))]
+    else:
+        first, last = objects[0], objects[-1]
+    if index is not None:
+        start, end = (index.start, index.stop - 1) if isinstance(index, slice) else (index[0], index[-1])
+        if start == first.index and end == last.index:
+            return index
+    return indexSlice(objects.values() if isinstance(objects, dict) else objects)
+
+
+def optimizeModel(model):
+    """Assembles the registered objective and optimizes the model, cached solution values are invalidated"""
+    getObjectiveRegistry(model).assemble()
+    model.optimize()
+    model._solve_count = getattr(model, '_solve_count', 0) + 1
+    return model.Status
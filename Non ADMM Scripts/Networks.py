@@ -1,5 +1,8 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import gurobipy as gp
+import scipy.sparse as sp
+from Model_Build import updateModel, getSolution, cachedIndex
 class Network:
 
     def __init__(self, T, model, Econnections,  name = None):
@@ -17,6 +20,9 @@ class Network:
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
+        if getattr(self.model, '_matrix_api', False):
+            self._setMatrixConstraints()
+            return
         self.constraints = []
         for t in self.T[0]:
             constraint = self.model.addConstr(
@@ -24,36 +30,54 @@ class Network:
                 name=f"sum_zero_constraint_{t}"
             )
             self.constraints.append(constraint)
-        self.model.update()
+        self._index = None
+        updateModel(self.model)
+
+    def _setMatrixConstraints(self):
+        """Sets the balance constraints as one block through the matrix API"""
+        n = len(self.T[0])
+        powerVar = [var for Econnection in self.Econnections for var in Econnection.powerVariables.values()]
+        A = sp.hstack([sp.identity(n, format='csr')] * len(self.Econnections), format='csr')
+        self.constraints = self.model.addMConstr(A, powerVar, gp.GRB.EQUAL, np.zeros(n), name="sum_zero_constraint").tolist()
+        self._index = None
+        updateModel(self.model)
 
     def deleteConstraints(self):
         """Deletes all the constraints of the optimization model"""
         for constraint in self.constraints:
             self.model.remove(constraint)
-        self.model.update()
+        updateModel(self.model)
         self.constraints = []
+        self._index = None
 
     def addEconnection(self, Econnection):
-        """Adds an Econnection to the network and updates the constraints"""
+        """Adds an Econnection to the network by adding its variables to the existing balance constraints"""
         self.Econnections.append(Econnection)
         Econnection.set_network(self)
-        self.deleteConstraints()
-        self.setConstraints()
+        self._setCoefficients(Econnection, 1.0)
 
     def removeEconnection(self, Econnection):
-        """Removes an Econnection from the network and updates the constraints"""
+        """Removes an Econnection from the network by removing its variables from the balance constraints"""
         if Econnection in self.Econnections:
             self.Econnections.remove(Econnection)
-            self.deleteConstraints()
-            self.setConstraints()
+            self._setCoefficients(Econnection, 0.0)
+
+    def _setCoefficients(self, Econnection, value):
+        """Sets the coefficient of the connection variables in the balance constraints, one change per time step"""
+        powerVar = Econnection.powerVariables
+        for t, constraint in zip(self.T[0], self.constraints):
+            self.model.chgCoeff(constraint, powerVar[t], value)
 
 
     def updateDual(self):
-        """Returns a list of dual values for each time period"""
-        duals = []
-        for t in self.T[0]:
-            duals.append(self.constraints[t].Pi)
-        self.dual = duals
+        """Sets the dual values for each time period, a view into the dual array of the model"""
+        self.dual = self.dualValues
+
+    @property
+    def dualValues(self):
+        """Dual values of the balance constraints, extracted for all networks at once after a solve"""
+        self._index = cachedIndex(self._index, self.constraints)
+        return getSolution(self.model).Pi[self._index]
     
     def plotData(self):
         months = ["25 Mar", "26 Mar", "27 Mar","28 Mar", "29 Mar", "30 Mar", "31 Mar", "01 Apr", "02 Apr", "03 Apr", "04 Apr", "05 Apr", "06 Apr", ]
@@ -100,7 +124,7 @@ class ThermalNetwork:
             (gp.quicksum(Hconnection.heatVariables[t] for Hconnection in self.Hconnections) == 0 for t in self.T),
             name="sum_zero_constraint"
         )
-        self.model.update()
+        updateModel(self.model)
 
     def updateDual(self):
         """Returns a list of dual values for each time period"""
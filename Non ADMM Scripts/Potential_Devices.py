@@ -1,13 +1,14 @@
 import numpy as np 
 import gurobipy as gp 
 from gurobipy import GRB
-import pandas as pd
 from Connections_NA import EConnection, HConnection
+from Profiles import getProfile
+from Model_Build import getObjectiveRegistry, updateModel
 
 def addBudgetConstraint(potential_devices, budget):
     model = potential_devices[0].getModel()
     model.addConstr(gp.quicksum(d.investmentVar * d.investment_cost for d in potential_devices) <= budget, name="budget_constraint")
-    model.update()
+    updateModel(model)
 
 
 class PotentialDevice:
@@ -79,24 +80,23 @@ class PotentialRenewable(PotentialDevice):
 
 
     def determinePowerGeneration(self):
-        df = pd.read_excel('Renewable_potential.xlsx')
         if self.technology == 'Wind':
             column_name = 'Wind_potential'
         elif self.technology == 'PV':
             column_name  = 'PV_potential'
         else:
             print("No valid technology")
-        normalized_power_potential = df[column_name].tolist()
+        normalized_power_potential = getProfile('Renewable_potential.xlsx', column_name, self.T)
         # Calculate real power based on normalized load profile and annual power demand
-        real_power = [x * self.install_cap for x in normalized_power_potential]
+        real_power = np.asarray(normalized_power_potential, dtype=np.float64) * self.install_cap
         return real_power
     
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
-        powerVar = self.Econnections[0].powerVariables
+        powerVar = self.Econnections[0].powerMVar
 
         # When there is a dissipation device available
-        self.model.addConstrs(-powerVar[t] ==  self.z * self.power_available[t] for t in self.T)   
+        self.model.addConstr(-powerVar ==  self.power_available[self.T] * gp.MVar.fromvar(self.z))   
 
         # When there is not
         # self.model.addConstrs(-powerVar[t] <=  self.z * self.power_available[t] for t in self.T)
@@ -123,8 +123,7 @@ class PotentialTransmissionLine(PotentialDevice):
     def _updateObjective(self):
         powerVar   = self.Econnections[0].powerVariables
         self.objective  = gp.quicksum(self.alpha * (powerVar[t] * powerVar[t])  for t in self.T)
-        self.model.setObjective(self.model.getObjective() + self.objective, gp.GRB.MINIMIZE)
-        self.model.update()
+        getObjectiveRegistry(self.model).register(self, self.objective)
 
     def setConstraints(self):
         """Sets the constraints of the optimization model"""
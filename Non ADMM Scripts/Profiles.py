@@ -0,0 +1,114 @@
+import os
+import sys
+import glob
+import numpy as np
+import pandas as pd
+
+
+def compiledPath(file):
+    """Returns the directory that holds the binary columns of a workbook"""
+    return os.path.splitext(file)[0] + '.profiles'
+
+
+def compileWorkbook(file):
+    """Writes every numeric column of the workbook to its own .npy file, so it can be memory-mapped later"""
+    df = pd.read_excel(file)
+    target = compiledPath(file)
+    os.makedirs(target, exist_ok=True)
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            np.save(os.path.join(target, f"{column}.npy"), df[column].to_numpy(dtype=np.float64))
+    return target
+
+
+def compileWorkbooks(directory):
+    """Compiles all workbooks in the directory, returns the created directories"""
+    return [compileWorkbook(file) for file in sorted(glob.glob(os.path.join(directory, '*.xlsx')))]
+
+
+def horizonSlice(profile, T):
+    """Returns the part of the profile covering the horizon T as a view, indexing with t in T stays valid"""
+    if T is None:
+        return profile
+    return profile[:max(T) + 1]
+
+
+class ProfileStore:
+    """Process-wide cache of the hourly profiles stored in the Data workbooks
+
+    Compiled columns (see compileWorkbook) are memory-mapped, other columns are parsed from the workbook.
+
+    Attributes:
+        hits (int): Number of profile requests answered from the cache
+        misses (int): Number of profile requests that had to load the profile first
+    """
+
+    def __init__(self):
+        """Initialize an empty store. """
+        self._profiles = {}
+        self._parsed_files = set()
+        self.mapped = 0
+        self.hits = 0
+        self.misses = 0
+
+    def getProfile(self, file, column, T=None):
+        """Returns the column of the workbook as a read-only float64 array, the workbook is parsed only once"""
+        key = (os.path.abspath(file), column)
+        if key in self._profiles:
+            self.hits += 1
+            return horizonSlice(self._profiles[key], T)
+
+        self.misses += 1
+        if not self._mapColumn(key) and key[0] not in self._parsed_files:
+            self._parseWorkbook(key[0])
+        if key not in self._profiles:
+            raise KeyError(f"Column {column} not found in {file}")
+        return horizonSlice(self._profiles[key], T)
+
+    def _mapColumn(self, key):
+        """Memory-maps the compiled column when it is at least as recent as the workbook"""
+        path, column = key
+        binary = os.path.join(compiledPath(path), f"{column}.npy")
+        if not os.path.exists(binary):
+            return False
+        if os.path.exists(path) and os.path.getmtime(binary) < os.path.getmtime(path):
+            return False
+        self._profiles[key] = np.load(binary, mmap_mode='r')
+        self.mapped += 1
+        return True
+
+    def _parseWorkbook(self, path):
+        """Reads every numeric column of the workbook into the store"""
+        df = pd.read_excel(path)
+        for column in df.columns:
+            if pd.api.types.is_numeric_dtype(df[column]) and (path, column) not in self._profiles:
+                profile = df[column].to_numpy(dtype=np.float64, copy=True)
+                profile.flags.writeable = False
+                self._profiles[(path, column)] = profile
+        self._parsed_files.add(path)
+
+    def stats(self):
+        """Returns the hit and miss counts of the store"""
+        return {'hits': self.hits, 'misses': self.misses, 'workbooks': len(self._parsed_files), 'mapped': self.mapped}
+
+    def clear(self):
+        """Drops all cached profiles and resets the counters"""
+        self._profiles = {}
+        self._parsed_files = set()
+        self.mapped = 0
+        self.hits = 0
+        self.misses = 0
+
+
+profile_store = ProfileStore()
+
+
+def getProfile(file, column, T=None):
+    """Returns a profile from the process-wide store"""
+    return profile_store.getProfile(file, column, T)
+
+
+if __name__ == '__main__':
+    # Usage: python Profiles.py <directory with the workbooks>
+    for target in compileWorkbooks(sys.argv[1] if len(sys.argv) > 1 else '.'):
+        print(f"Compiled {target}")
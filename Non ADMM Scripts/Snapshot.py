@@ -0,0 +1,210 @@
+import json
+import importlib
+import numpy as np
+import scipy.sparse as sp
+import gurobipy as gp
+from Compiler import CanonicalProblem
+from Model_Build import getObjectiveRegistry, QuadraticCost
+
+
+class _Encoder:
+    """Turns the attributes of devices, connections and networks into JSON, large arrays go to the npz file"""
+
+    def __init__(self, objects):
+        self.ids = {id(obj): str(i) for i, obj in enumerate(objects)}
+        self.arrays = {}
+
+    def _array(self, array):
+        key = f"a{len(self.arrays)}"
+        self.arrays[key] = array
+        return key
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, (np.integer, np.floating)):
+            return value.item()
+        if id(value) in self.ids:
+            return {'__ref__': self.ids[id(value)]}
+        if isinstance(value, gp.Model):
+            return {'__model__': True}
+        if isinstance(value, gp.Var):
+            return {'__var__': value.index}
+        if isinstance(value, gp.Constr):
+            return {'__constr__': value.index}
+        if isinstance(value, gp.tupledict):
+            keys = list(value.keys())
+            if not all(isinstance(v, gp.Var) for v in value.values()):
+                return None
+            return {'__vars__': self._array(np.fromiter((v.index for v in value.values()), dtype=np.int64)), 'keys': self.encode(keys)}
+        if isinstance(value, np.ndarray):
+            return {'__array__': self._array(np.asarray(value))}
+        if isinstance(value, slice):
+            return {'__slice__': [value.start, value.stop]}
+        if isinstance(value, (list, tuple)) and len(value) > 0 and all(isinstance(v, gp.Constr) for v in value):
+            return {'__constrs__': self._array(np.fromiter((c.index for c in value), dtype=np.int64))}
+        if isinstance(value, tuple):
+            return {'__tuple__': [self.encode(v) for v in value]}
+        if isinstance(value, list):
+            return [self.encode(v) for v in value]
+        if isinstance(value, dict):
+            return {'__dict__': [[self.encode(k), self.encode(v)] for k, v in value.items()]}
+        # Expressions and other solver objects are rebuilt from the model
+        return None
+
+
+class _Decoder:
+    def __init__(self, model, arrays, objects):
+        self.model = model
+        self.arrays = arrays
+        self.objects = objects
+        self.variables = model.getVars()
+        self.constraints = model.getConstrs()
+
+    def decode(self, value):
+        if isinstance(value, list):
+            return [self.decode(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if '__ref__' in value:
+            return self.objects[value['__ref__']]
+        if '__model__' in value:
+            return self.model
+        if '__var__' in value:
+            return self.variables[value['__var__']]
+        if '__constr__' in value:
+            return self.constraints[value['__constr__']]
+        if '__vars__' in value:
+            keys = [tuple(k) if isinstance(k, list) else k for k in self.decode(value['keys'])]
+            return gp.tupledict(zip(keys, (self.variables[i] for i in self.arrays[value['__vars__']])))
+        if '__constrs__' in value:
+            return [self.constraints[i] for i in self.arrays[value['__constrs__']]]
+        if '__array__' in value:
+            return self.arrays[value['__array__']]
+        if '__slice__' in value:
+            return slice(*value['__slice__'])
+        if '__tuple__' in value:
+            return tuple(self.decode(v) for v in value['__tuple__'])
+        if '__dict__' in value:
+            return {self._key(self.decode(k)): self.decode(v) for k, v in value['__dict__']}
+        return value
+
+    @staticmethod
+    def _key(key):
+        return tuple(key) if isinstance(key, list) else key
+
+
+def _encodeTerm(expr, encoder):
+    """Returns the registered cost term of a device as variable indices and coefficients"""
+    if isinstance(expr, QuadraticCost):
+        index = np.fromiter((v.index for v in expr.variables), dtype=np.int64, count=len(expr.variables))
+        return {'separable': True, 'index': encoder._array(index), 'q': encoder._array(np.array(expr.q)),
+                'c': encoder._array(np.array(expr.c)), 'constant': expr.constant}
+    quad = expr if isinstance(expr, gp.QuadExpr) else gp.QuadExpr(expr)
+    linear = quad.getLinExpr()
+    return {
+        'separable': False,
+        'var1': encoder._array(np.array([quad.getVar1(i).index for i in range(quad.size())], dtype=np.int64)),
+        'var2': encoder._array(np.array([quad.getVar2(i).index for i in range(quad.size())], dtype=np.int64)),
+        'q': encoder._array(np.array([quad.getCoeff(i) for i in range(quad.size())], dtype=np.float64)),
+        'index': encoder._array(np.array([linear.getVar(i).index for i in range(linear.size())], dtype=np.int64)),
+        'c': encoder._array(np.array([linear.getCoeff(i) for i in range(linear.size())], dtype=np.float64)),
+        'constant': linear.getConstant(),
+    }
+
+
+def _decodeTerm(entry, variables, arrays):
+    """Rebuilds a cost term written by _encodeTerm against the variables of the loaded model"""
+    linear = [variables[i] for i in arrays[entry['index']]]
+    if entry['separable']:
+        return QuadraticCost(linear, arrays[entry['q']], arrays[entry['c']], entry['constant'])
+    expr = gp.QuadExpr(gp.LinExpr(arrays[entry['c']].tolist(), linear))
+    expr.addTerms(arrays[entry['q']].tolist(), [variables[i] for i in arrays[entry['var1']]], [variables[i] for i in arrays[entry['var2']]])
+    expr.addConstant(entry['constant'])
+    return expr
+
+
+def _collectObjects(devices, nets):
+    """Returns the devices, networks and their connections, each once"""
+    objects = []
+    seen = set()
+    for obj in list(devices) + list(nets):
+        for item in [obj] + list(getattr(obj, 'Econnections', None) or []) + list(getattr(obj, 'Hconnections', None) or []):
+            if id(item) not in seen:
+                seen.add(id(item))
+                objects.append(item)
+    return objects
+
+
+def saveSnapshot(path, model, devices, nets, write_mps=False):
+    """Writes the built system to path.npz (model matrices and arrays) and path.json (objects and index ranges)
+
+    Args:
+        devices (list): All devices of the system, including unattached candidates
+        nets (list): All networks of the system
+        write_mps (bool): Also writes the model to path.mps for other solvers
+    """
+    problem = CanonicalProblem.fromModel(model)
+    objects = _collectObjects(devices, nets)
+    encoder = _Encoder(objects)
+    meta = {
+        'objects': [{'class': [type(obj).__module__, type(obj).__qualname__], 'attrs': {k: encoder.encode(v) for k, v in vars(obj).items()}}
+                    for obj in objects],
+        'devices': [encoder.ids[id(d)] for d in devices],
+        'nets': [encoder.ids[id(n)] for n in nets],
+        # Cost terms of the registry per device, terms of objects outside the snapshot keep their position as key
+        'terms': [[encoder.ids.get(id(owner), f"term{i}"), _encodeTerm(expr, encoder)]
+                  for i, (owner, expr) in enumerate(getObjectiveRegistry(model).terms.items())],
+    }
+    A = problem.A.tocsr()
+    Q = problem.Q.tocoo()
+    np.savez(
+        f"{path}.npz",
+        A_data=A.data, A_indices=A.indices, A_indptr=A.indptr, A_shape=np.array(A.shape),
+        Q_row=Q.row, Q_col=Q.col, Q_data=Q.data,
+        sense=problem.sense, rhs=problem.rhs, lb=problem.lb, ub=problem.ub, c=problem.c, const=np.array(problem.const),
+        vtype=problem.vtype, names=np.array(problem.names), constr_names=np.array(model.getAttr('ConstrName', model.getConstrs())),
+        **encoder.arrays,
+    )
+    with open(f"{path}.json", 'w') as file:
+        json.dump(meta, file)
+    if write_mps:
+        model.write(f"{path}.mps")
+
+
+def loadSnapshot(path, model=None):
+    """Loads a system written by saveSnapshot, returns (model, devices, nets) wired to the loaded model
+
+    The objects are recreated without running their constructors, so no constraint is built again. The objective
+    registry is rebuilt from the cost terms of every device, so terms can be registered again or dropped as before.
+    """
+    with open(f"{path}.json") as file:
+        meta = json.load(file)
+    data = np.load(f"{path}.npz")
+    n = int(data['A_shape'][1])
+    A = sp.csr_matrix((data['A_data'], data['A_indices'], data['A_indptr']), shape=tuple(data['A_shape']))
+    Q = sp.csr_matrix((data['Q_data'], (data['Q_row'], data['Q_col'])), shape=(n, n))
+    problem = CanonicalProblem(A, data['sense'], data['rhs'], data['lb'], data['ub'], data['c'], Q, float(data['const']),
+                               vtype=data['vtype'], names=data['names'].tolist())
+    model = problem.toGurobi(model)
+    model.setAttr('ConstrName', model.getConstrs(), data['constr_names'].tolist())
+    objects = {}
+    for i, entry in enumerate(meta['objects']):
+        module, qualname = entry['class']
+        cls = getattr(importlib.import_module(module), qualname)
+        objects[str(i)] = object.__new__(cls)
+    decoder = _Decoder(model, data, objects)
+    for i, entry in enumerate(meta['objects']):
+        obj = objects[str(i)]
+        for name, value in entry['attrs'].items():
+            setattr(obj, name, decoder.decode(value))
+
+    registry = getObjectiveRegistry(model)
+    for key, entry in meta['terms']:
+        expr = _decodeTerm(entry, decoder.variables, data)
+        if key in objects:
+            objects[key].objective = expr
+            registry.register(objects[key], expr)
+        else:
+            registry.register(key, expr)
+    return model, [objects[i] for i in meta['devices']], [objects[i] for i in meta['nets']]
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'ADMM Scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'Non ADMM Scripts'))
+# Modules named as the notebooks import them, on sys.path so spawned worker processes find them as well
+sys.path.insert(0, os.path.join(ROOT, 'tests', 'module_names'))
@@ -0,0 +1,2 @@
+# The ADMM modules import Connection_ADMM under the name it has in the notebooks
+from Connection_ADMM import *
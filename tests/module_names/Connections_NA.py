@@ -0,0 +1,2 @@
+# The non-ADMM modules import Connections under the name it has in the notebooks
+from Connections import *
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+from Device_ADMM import Generator, FixedLoadTest, TransmissionLine, ExternalPower, PowerDissipation
+from Network_ADMM import Network
+from ADMM_Runner import ADMMRunner, benchmarkWorkers
+
+
+def buildSystem(T, rho=10):
+    """Two networks joined by a line, a generator and a load on the first, external power and a load on the second"""
+    generator = Generator(T, power_min=0, power_max=5, ramp_min=-1, ramp_max=1, operating_point=2, alpha=1, beta=10, gamma=0)
+    load_1 = FixedLoadTest(T, power=list(np.linspace(1, 3, len(T))), name='Load 1')
+    load_2 = FixedLoadTest(T, power=list(np.linspace(2, 1, len(T))), name='Load 2')
+    line = TransmissionLine(T, power_max=1.5)
+    external = ExternalPower(T, 20, name='External')
+    dissipation = PowerDissipation(T, name='Dissipation')
+    devices = [generator, load_1, load_2, line, external, dissipation]
+    for device in devices:
+        device.rho = rho
+    nets = [Network(T, [generator.Econnections[0], load_1.Econnections[0], line.Econnections[0], dissipation.Econnections[0]], name='Net 1'),
+            Network(T, [line.Econnections[1], external.Econnections[0], load_2.Econnections[0]], name='Net 2')]
+    return devices, nets
+
+
+def prices(nets):
+    return [net.prices.copy() for net in nets]
+
+
+def test_network_rho_comes_from_devices():
+    devices, nets = buildSystem(list(range(6)), rho=10)
+    assert [net.rho for net in nets] == [10, 10]
+    # Adaptive rho starts from the rho of the devices
+    with ADMMRunner(devices, nets, workers=0, adaptive='global'):
+        assert [net.rho for net in nets] == [10, 10]
+        assert all(c.rho == 10 for net in nets for c in net.Econnections)
+
+
+def test_mixed_rho_raises():
+    devices, nets = buildSystem(list(range(6)), rho=10)
+    devices[0].rho = 1
+    with pytest.raises(ValueError):
+        nets[0].rho
+
+
+def test_warm_start_from_converged_solution():
+    T = list(range(12))
+    devices, nets = buildSystem(T)
+    with ADMMRunner(devices, nets, workers=0) as runner:
+        assert runner.run(max_iter=2000, epsilon=1e-4, stopping='residuals')
+        assert runner.iteration > 10
+    converged_prices = prices(nets)
+    powers = [net.power.copy() for net in nets]
+
+    devices, nets = buildSystem(T)
+    with ADMMRunner(devices, nets, workers=0) as runner:
+        runner.warmStart(converged_prices, powers)
+        assert runner.run(max_iter=2000, epsilon=1e-4, stopping='residuals')
+        assert runner.iteration == 1
+    for warm, cold in zip(prices(nets), converged_prices):
+        np.testing.assert_allclose(warm, cold, rtol=1e-2)
+
+
+def test_checkpoint_resume_matches_continuous_run(tmp_path):
+    T = list(range(12))
+    options = dict(workers=0, alpha=1.5, accelerated=True, adaptive='global')
+    devices, nets = buildSystem(T)
+    with ADMMRunner(devices, nets, **options) as runner:
+        runner.run(max_iter=20, epsilon=0)
+    continuous = prices(nets)
+
+    path = str(tmp_path / 'admm.npz')
+    devices, nets = buildSystem(T)
+    with ADMMRunner(devices, nets, **options) as runner:
+        runner.run(max_iter=10, epsilon=0, checkpoint=path, checkpoint_every=3)
+    devices, nets = buildSystem(T)
+    with ADMMRunner(devices, nets, **options) as runner:
+        runner.loadCheckpoint(path)
+        assert runner.iteration == 10
+        runner.run(max_iter=10, epsilon=0)
+    for resumed, reference in zip(prices(nets), continuous):
+        np.testing.assert_array_equal(resumed, reference)
+
+
+
+def test_benchmark_workers_runs_fixed_iterations():
+    devices, nets = buildSystem(list(range(6)))
+    results = benchmarkWorkers(devices, nets, workers=(0, 1), iterations=5)
+    assert [r['workers'] for r in results] == [0, 1]
+    assert results[0]['speedup'] == 1
+    assert all(0 < r['solve'] <= r['iteration'] for r in results)
+    reference = prices(nets)
+    for net in nets:
+        net.reset()
+    with ADMMRunner(devices, nets, workers=0) as runner:
+        for _ in range(5):
+            runner.step()
+    np.testing.assert_allclose(prices(nets), reference)
+
+
+def test_worker_processes_reproduce_in_process_run():
+    results = []
+    for workers in (0, 2):
+        devices, nets = buildSystem(list(range(6)))
+        # Without the closed-form updates every device is solved, so both workers get devices
+        with ADMMRunner(devices, nets, workers=workers, closed_form=False) as runner:
+            residuals = [runner.step() for _ in range(8)]
+        results.append((runner.workers, prices(nets), np.array(residuals)))
+    assert [r[0] for r in results] == [0, 2]
+    np.testing.assert_allclose(results[1][1], results[0][1], rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(results[1][2], results[0][2], rtol=1e-6, atol=1e-8)
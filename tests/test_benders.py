@@ -0,0 +1,37 @@
+import itertools
+import numpy as np
+import gurobipy as gp
+from Benders import BendersEngine, BendersSubproblem
+
+
+def buildSystem(model, T):
+    from Devices import Generator, ExternalPower, FixedLoadTest
+    from Networks import Network
+    from Potential_Devices import PotentialStorage, PotentialTransmissionLine
+    investments = {'Storage': {30: 15}, 'Transmission': {'Short': {2: 4}}}
+    generator = Generator(T, model, power_max=3, power_min=0, ramp_min=-1, ramp_max=1, operating_point=1, alpha=1, beta=10, gamma=1)
+    external = ExternalPower(T, model, 60)
+    load = FixedLoadTest(T, model, power=list(np.linspace(0.5, 2.5, len(T))))
+    storage = PotentialStorage(T, model, 0, investments, discharge_max=2, charge_max=2, energy_max=30)
+    line = PotentialTransmissionLine(T, model, 0, 1, investments, 'Short', power_max=2, alpha=0.2)
+    Network(T, model, [generator.Econnections[0], line.Econnections[0], storage.Econnections[0]])
+    Network(T, model, [load.Econnections[0], external.Econnections[0], line.Econnections[1]])
+    return [storage, line]
+
+
+def test_benders_matches_enumeration():
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    potential_devices = buildSystem(model, list(range(6)))
+    budget = 16
+    engine = BendersEngine.fromPotentialDevices(model, potential_devices, budget, verbose=False)
+    best_z = engine.solve()
+
+    costs = [d.investment_cost for d in potential_devices]
+    subproblem = BendersSubproblem(model, potential_devices)
+    feasible = [z for z in itertools.product([0, 1], repeat=len(costs)) if np.dot(costs, z) <= budget]
+    enumerated = {z: subproblem.solve(z)[0] for z in feasible}
+    subproblem.restore()
+    assert np.isclose(engine.upper_bound, min(enumerated.values()))
+    assert np.isclose(enumerated[tuple(int(v) for v in best_z)], min(enumerated.values()))
+    assert engine.history[-1]['gap'] <= engine.tolerance * max(1, abs(engine.upper_bound))
@@ -0,0 +1,59 @@
+import numpy as np
+import gurobipy as gp
+from Model_Build import optimizeModel
+from Candidate_Pool import CandidatePool
+from Investment_Heuristics import createDeviceValue, detachCandidate
+
+T = list(range(6))
+PRICES = {'Storage': {3: 15}, 'Transmission': {'Short': {1: 4, 2: 7}}}
+
+
+def buildBase(T, model):
+    """Module level, so the spawned workers can build the same base system"""
+    from Devices import Generator, ExternalPower, FixedLoadTest
+    from Networks import Network
+    generator = Generator(T, model, power_max=3, power_min=0, ramp_min=-1, ramp_max=1, operating_point=1, alpha=1, beta=10, gamma=1)
+    external = ExternalPower(T, model, 60)
+    load = FixedLoadTest(T, model, power=list(np.linspace(0.5, 2.5, len(T))))
+    return [Network(T, model, [generator.Econnections[0]]), Network(T, model, [load.Econnections[0], external.Econnections[0]])]
+
+
+def buildCandidates(T, model, nets):
+    from Devices_Heuristic import HeuristicStorage, HeuristicTransmissionLine
+    candidates = [HeuristicStorage(T, model, 1, PRICES, discharge_max=1, charge_max=1, energy_max=3),
+                  HeuristicTransmissionLine(T, model, 0, 1, PRICES, 'Short', power_max=1, alpha=0.25),
+                  HeuristicTransmissionLine(T, model, 0, 1, PRICES, 'Short', power_max=2, alpha=0.25)]
+    for candidate in candidates:
+        detachCandidate(candidate, nets)
+    return candidates
+
+
+def serialValues():
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    nets = buildBase(T, model)
+    candidates = buildCandidates(T, model, nets)
+    optimizeModel(model)
+    benchmark_cost = model.ObjVal
+    return candidates, benchmark_cost, createDeviceValue(candidates, benchmark_cost, nets)
+
+
+def test_pool_matches_serial_device_values():
+    candidates, benchmark_cost, serial = serialValues()
+    with CandidatePool(buildBase, T, workers=2) as pool:
+        parallel = pool.createDeviceValue(candidates, benchmark_cost)
+    assert [r[1:5] for r in parallel] == [r[1:5] for r in serial]
+    np.testing.assert_allclose([r[5] for r in parallel], [r[5] for r in serial], rtol=1e-6)
+    assert serial[1][5] > 0 and serial[2][5] > serial[1][5]
+
+
+def test_worker_model_returns_to_benchmark_between_evaluations():
+    from Candidate_Pool import describeCandidate
+    candidates, benchmark_cost, serial = serialValues()
+    descriptors = [describeCandidate(p) for p in candidates]
+    # One worker evaluates every candidate twice, in a different order the second time
+    with CandidatePool(buildBase, T, workers=1) as pool:
+        first = pool.evaluate(descriptors, benchmark_cost)
+        second = pool.evaluate(descriptors[::-1], benchmark_cost)[::-1]
+    np.testing.assert_allclose([r[2] for r in first], [r[5] for r in serial], rtol=1e-6)
+    np.testing.assert_allclose([r[2] for r in second], [r[2] for r in first], rtol=1e-6)
@@ -0,0 +1,64 @@
+import numpy as np
+import gurobipy as gp
+from Compiler import CanonicalModel, CanonicalProblem
+from Model_Build import optimizeModel
+
+
+def buildSystem(model, T):
+    from Devices import Generator, ExternalPower, FixedLoadTest, TransmissionLine, useMatrixAPI
+    from Networks import Network
+    from Potential_Devices import PotentialStorage, PotentialTransmissionLine, addBudgetConstraint
+    useMatrixAPI(model)
+    investments = {'Storage': {30: 15}, 'Transmission': {'Short': {2: 4}}}
+    generator = Generator(T, model, power_max=2, power_min=0, ramp_min=-1, ramp_max=1, operating_point=1, alpha=1, beta=10, gamma=1)
+    external = ExternalPower(T, model, 60)
+    load = FixedLoadTest(T, model, power=list(np.linspace(1, 3, len(T))))
+    line = TransmissionLine(T, model, power_max=1, alpha=0.25)
+    storage = PotentialStorage(T, model, 0, investments, discharge_max=2, charge_max=2, energy_max=30)
+    potential_line = PotentialTransmissionLine(T, model, 0, 1, investments, 'Short', power_max=2, alpha=0.2)
+    addBudgetConstraint([storage, potential_line], 20)
+    Network(T, model, [generator.Econnections[0], line.Econnections[0], potential_line.Econnections[0], load.Econnections[0]])
+    Network(T, model, [external.Econnections[0], line.Econnections[1], potential_line.Econnections[1], storage.Econnections[0]])
+
+
+def test_compile_matches_gurobi_model():
+    T = list(range(6))
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    buildSystem(model, T)
+    model.update()
+    reference = CanonicalProblem.fromModel(model)
+    canonical = CanonicalModel()
+    buildSystem(canonical, T)
+    problem = canonical.compile()
+
+    assert problem.A.shape == reference.A.shape
+    assert abs(problem.A - reference.A).max() == 0
+    np.testing.assert_array_equal(problem.sense, reference.sense)
+    np.testing.assert_allclose(problem.rhs, reference.rhs)
+    np.testing.assert_allclose(problem.c, reference.c)
+    assert abs(problem.Q - reference.Q).max() < 1e-12
+    assert np.isclose(problem.const, reference.const)
+    np.testing.assert_array_equal(problem.vtype, reference.vtype)
+
+    compiled = problem.toGurobi()
+    compiled.setParam('OutputFlag', 0)
+    compiled.optimize()
+    optimizeModel(model)
+    assert np.isclose(compiled.ObjVal, model.ObjVal)
+
+
+def test_constraint_rows_can_be_removed():
+    canonical = CanonicalModel()
+    x = canonical.addVars(2)
+    block = canonical.addMConstr(np.eye(2), list(x.values()), gp.GRB.LESS_EQUAL, np.ones(2))
+    row = canonical.addConstr(x[0] + 2 * x[1] >= 3)
+    rows = canonical.addConstrs(x[i] == i for i in range(2))
+    np.testing.assert_array_equal(block, [0, 1])
+    assert row == 2
+    np.testing.assert_array_equal(rows, [3, 4])
+    canonical.remove(rows)
+    problem = canonical.compile()
+    np.testing.assert_array_equal(problem.A.toarray(), [[1, 0], [0, 1], [1, 2]])
+    np.testing.assert_array_equal(problem.sense, ['<', '<', '>'])
+    np.testing.assert_array_equal(problem.rhs, [1, 1, 3])
@@ -0,0 +1,91 @@
+import numpy as np
+import gurobipy as gp
+from Model_Build import optimizeModel
+from Investment_Heuristics import detachCandidate, evaluateCandidate
+from Evaluation_Cache import EvaluationCache, CachedEvaluator, systemFingerprint
+
+T = list(range(6))
+PRICES = {'Storage': {3: 15}, 'Transmission': {'Short': {1: 4, 2: 7}}}
+
+
+def buildBase(model, external_price=60):
+    from Devices import Generator, ExternalPower, FixedLoadTest
+    from Networks import Network
+    generator = Generator(T, model, power_max=3, power_min=0, ramp_min=-1, ramp_max=1, operating_point=1, alpha=1, beta=10, gamma=1)
+    external = ExternalPower(T, model, external_price)
+    load = FixedLoadTest(T, model, power=list(np.linspace(0.5, 2.5, len(T))))
+    return [Network(T, model, [generator.Econnections[0]]), Network(T, model, [load.Econnections[0], external.Econnections[0]])]
+
+
+def createCandidate(model, nets, kind):
+    from Devices_Heuristic import HeuristicStorage, HeuristicTransmissionLine
+    if kind == 'storage':
+        candidate = HeuristicStorage(T, model, 1, PRICES, discharge_max=1, charge_max=1, energy_max=3)
+    else:
+        candidate = HeuristicTransmissionLine(T, model, 0, 1, PRICES, 'Short', power_max=kind, alpha=0.25)
+    detachCandidate(candidate, nets)
+    return candidate
+
+
+def buildSystem(kinds, external_price=60):
+    """Fingerprints the benchmark system, then creates the candidates in the given order"""
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    nets = buildBase(model, external_price)
+    fingerprint = systemFingerprint(model)
+    candidates = {kind: createCandidate(model, nets, kind) for kind in kinds}
+    return model, nets, fingerprint, candidates
+
+
+def test_cache_hits_for_the_same_configuration(tmp_path):
+    cache = EvaluationCache(str(tmp_path / 'cache.sqlite'))
+    model, nets, fingerprint, candidates = buildSystem(['storage', 2])
+    evaluator = CachedEvaluator(cache, model, fingerprint)
+    first = evaluator.evaluate(candidates[2], nets)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert evaluator.evaluate(candidates[2], nets) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_allclose(first, evaluateCandidate(candidates[2], nets))
+    evaluator.evaluate(candidates['storage'], nets)
+    assert cache.stats()['entries'] == 2
+
+
+def test_key_does_not_depend_on_candidate_build_order(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    model, nets, fingerprint, candidates = buildSystem(['storage', 2])
+    cached = CachedEvaluator(EvaluationCache(path), model, fingerprint).evaluate(candidates[2], nets)
+
+    model, nets, other_fingerprint, candidates = buildSystem([1, 2, 'storage'])
+    assert other_fingerprint == fingerprint
+    cache = EvaluationCache(path)
+    assert CachedEvaluator(cache, model, other_fingerprint).evaluate(candidates[2], nets) == cached
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_changed_system_is_not_answered_from_cache(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    model, nets, fingerprint, candidates = buildSystem([2])
+    cached = CachedEvaluator(EvaluationCache(path), model, fingerprint).evaluate(candidates[2], nets)
+
+    model, nets, other_fingerprint, candidates = buildSystem([2], external_price=30)
+    assert other_fingerprint != fingerprint
+    cache = EvaluationCache(path)
+    fresh = CachedEvaluator(cache, model, other_fingerprint).evaluate(candidates[2], nets)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert fresh != cached
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path):
+    cache = EvaluationCache(str(tmp_path / 'cache.sqlite'))
+    duals = np.zeros((2, 6))
+    cache.put('a', 1.0, duals)
+    entry_size = cache.stats()['bytes']
+    cache.max_bytes = 2 * entry_size
+    cache.put('b', 2.0, duals)
+    assert cache.get('a')[0] == 1.0
+    cache.put('c', 3.0, duals)
+    # b was used least recently, a was looked up after b was stored
+    assert cache.get('b') is None
+    assert cache.get('a')[0] == 1.0
+    np.testing.assert_array_equal(cache.get('c')[1], duals)
+    assert cache.stats()['bytes'] <= 2 * entry_size
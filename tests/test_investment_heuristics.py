@@ -0,0 +1,204 @@
+import itertools
+import numpy as np
+import gurobipy as gp
+from Model_Build import optimizeModel
+from Investment_Heuristics import WarmStartEvaluator, attachCandidate, detachCandidate, evaluateCandidate, \
+    lazyGreedyHeuristic, returnOnInvestment, createDeviceValue, estimateCandidateValues, screenCandidates, \
+    createScreenedDeviceValue, multipleChoiceKnapsack
+
+
+def buildSystem(model, T):
+    from Devices import Generator, ExternalPower, FixedLoadTest
+    from Networks import Network
+    from Devices_Heuristic import HeuristicStorage, HeuristicTransmissionLine
+    investments = {'Storage': {3: 15}, 'Transmission': {'Short': {2: 4}}}
+    generator = Generator(T, model, power_max=3, power_min=0, ramp_min=-1, ramp_max=1, operating_point=1, alpha=1, beta=10, gamma=1)
+    external = ExternalPower(T, model, 60)
+    load = FixedLoadTest(T, model, power=list(np.linspace(0.5, 2.5, len(T))))
+    nets = [Network(T, model, [generator.Econnections[0]]), Network(T, model, [load.Econnections[0], external.Econnections[0]])]
+    candidates = [HeuristicStorage(T, model, 0, investments, discharge_max=1, charge_max=1, energy_max=3),
+                  HeuristicTransmissionLine(T, model, 0, 1, investments, 'Short', power_max=2, alpha=0.25)]
+    for candidate in candidates:
+        detachCandidate(candidate, nets)
+    return nets, candidates
+
+
+def evaluateAll(measure_cold):
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    nets, candidates = buildSystem(model, list(range(8)))
+    evaluator = WarmStartEvaluator(model, measure_cold=measure_cold)
+    costs = [evaluator.evaluate(candidate, nets) for candidate in candidates]
+    return evaluator, costs
+
+
+def test_time_saved_is_labelled_by_reference_solve():
+    evaluator, _ = evaluateAll(measure_cold=False)
+    assert 'time_saved' not in evaluator.records[0]
+    assert evaluator.records[0]['benchmark_runtime'] == evaluator.reference['runtime']
+    assert set(evaluator.summary()) == {'candidates', 'iterations', 'benchmark_iterations', 'time_saved_vs_benchmark'}
+
+    evaluator, _ = evaluateAll(measure_cold=True)
+    assert 'time_saved_vs_benchmark' not in evaluator.records[0]
+    assert set(evaluator.summary()) == {'candidates', 'iterations', 'cold_iterations', 'time_saved'}
+
+
+def test_measure_cold_does_not_start_from_cold_solution():
+    warm, warm_costs = evaluateAll(measure_cold=False)
+    cold, cold_costs = evaluateAll(measure_cold=True)
+    np.testing.assert_allclose(cold_costs, warm_costs)
+    assert [r['iterations'] for r in cold.records] == [r['iterations'] for r in warm.records]
+
+
+def buildPool(model, T):
+    """The system of buildSystem with a larger candidate pool, one storage is free"""
+    from Devices_Heuristic import HeuristicStorage, HeuristicTransmissionLine
+    nets, candidates = buildSystem(model, T)
+    investments = {'Storage': {3: 15}, 'Transmission': {'Short': {1: 3, 2: 4}}}
+    free = HeuristicStorage(T, model, 1, investments, discharge_max=1, charge_max=1, energy_max=3)
+    free.investment_cost = 0
+    candidates += [HeuristicTransmissionLine(T, model, 0, 1, investments, 'Short', power_max=1, alpha=0.25), free]
+    for candidate in candidates[2:]:
+        detachCandidate(candidate, nets)
+    return nets, candidates
+
+
+def plainGreedy(potential_items, benchmark_cost, nets, budget):
+    """Re-evaluates every affordable candidate against the current selection and selects the best return"""
+    total_cost, residual = benchmark_cost, budget
+    remaining, selected_items = list(potential_items), []
+    while remaining:
+        affordable = [p for p in remaining if p.investment_cost <= residual]
+        if not affordable:
+            break
+        savings = [total_cost - evaluateCandidate(p, nets) for p in affordable]
+        rois = [returnOnInvestment(saving, p.investment_cost) for saving, p in zip(savings, affordable)]
+        best = int(np.argmax(rois))
+        if rois[best] <= 0:
+            break
+        p = affordable[best]
+        attachCandidate(p, nets)
+        selected_items.append(p)
+        remaining.remove(p)
+        residual -= p.investment_cost
+        total_cost -= savings[best]
+    return selected_items, total_cost
+
+
+def test_return_on_investment_of_free_candidates():
+    assert returnOnInvestment(5, 0) == np.inf
+    assert returnOnInvestment(0, 0) == 0
+    assert returnOnInvestment(-1, 0) == 0
+    assert returnOnInvestment(6, 3) == 2
+
+
+def test_lazy_greedy_matches_plain_greedy():
+    results = []
+    for heuristic in (lazyGreedyHeuristic, plainGreedy):
+        model = gp.Model()
+        model.setParam('OutputFlag', 0)
+        nets, candidates = buildPool(model, list(range(8)))
+        optimizeModel(model)
+        selected, total_cost = heuristic(candidates, model.ObjVal, nets, 5)
+        results.append(([candidates.index(p) for p in selected], total_cost))
+    assert results[0][0] == results[1][0]
+    np.testing.assert_allclose(results[0][1], results[1][1])
+    assert len(results[0][0]) > 1
+
+
+def buildScreening(model, T):
+    """Prices on the first net follow its load, the second net buys at a flat price, storages and lines as candidates"""
+    from Devices import Generator, ExternalPower, FixedLoadTest
+    from Networks import Network
+    from Devices_Heuristic import HeuristicStorage, HeuristicTransmissionLine
+    investments = {'Storage': {2: 10, 3: 15}, 'Transmission': {'Short': {1: 3, 2: 4}}}
+    generator = Generator(T, model, power_max=4, power_min=0, ramp_min=-2, ramp_max=2, operating_point=1, alpha=1, beta=10, gamma=5)
+    load_1 = FixedLoadTest(T, model, power=[0.5, 1, 2, 3, 3, 2, 1, 0.5])
+    external = ExternalPower(T, model, 60)
+    load_2 = FixedLoadTest(T, model, power=list(np.linspace(0.5, 2.5, len(T))))
+    nets = [Network(T, model, [generator.Econnections[0], load_1.Econnections[0]]),
+            Network(T, model, [load_2.Econnections[0], external.Econnections[0]])]
+    candidates = [HeuristicStorage(T, model, 0, investments, discharge_max=1, charge_max=1, energy_max=3),
+                  HeuristicStorage(T, model, 0, investments, discharge_max=1, charge_max=0, energy_max=3),
+                  HeuristicStorage(T, model, 0, investments, discharge_max=0.5, charge_max=0.5, energy_max=2),
+                  HeuristicTransmissionLine(T, model, 0, 1, investments, 'Short', power_max=1, alpha=0.25),
+                  HeuristicTransmissionLine(T, model, 0, 1, investments, 'Short', power_max=2, alpha=0.25)]
+    for candidate in candidates:
+        detachCandidate(candidate, nets)
+    model.setParam('OutputFlag', 0)
+    optimizeModel(model)
+    return nets, candidates, model.ObjVal
+
+
+def test_estimates_rank_candidates_like_resolved_savings():
+    nets, candidates, benchmark_cost = buildScreening(gp.Model(), list(range(8)))
+    estimates = estimateCandidateValues(candidates, nets)
+    savings = np.array([r[5] for r in createDeviceValue(candidates, benchmark_cost, nets)])
+    np.testing.assert_array_equal(np.sign(estimates), np.sign(np.round(savings, 6)))
+    np.testing.assert_array_equal(np.argsort(-estimates), np.argsort(-savings))
+    # A storage that cannot charge is worth nothing, a zero rate is not unlimited
+    assert estimates[1] == 0
+
+
+def test_screening_filters_on_top_k_and_threshold():
+    nets, candidates, _ = buildScreening(gp.Model(), list(range(8)))
+    selected, ranking = screenCandidates(candidates, nets)
+    assert [p for p, _ in ranking] == [candidates[i] for i in (4, 3, 0, 2, 1)]
+    assert selected == ranking
+    selected, _ = screenCandidates(candidates, nets, top_k=2)
+    assert [p for p, _ in selected] == [candidates[4], candidates[3]]
+    selected, _ = screenCandidates(candidates, nets, threshold=10)
+    assert [p for p, _ in selected] == [candidates[i] for i in (4, 3, 0, 2)]
+    selected, _ = screenCandidates(candidates, nets, top_k=4, threshold=12)
+    assert [p for p, _ in selected] == [candidates[i] for i in (4, 3, 0)]
+
+
+def test_screened_device_values_match_unscreened():
+    nets, candidates, benchmark_cost = buildScreening(gp.Model(), list(range(8)))
+    # Screening reads the duals of the benchmark solve, so it runs before the other evaluations
+    results, report = createScreenedDeviceValue(candidates, benchmark_cost, nets, top_k=3)
+    full = {r[0]: r for r in createDeviceValue(candidates, benchmark_cost, nets)}
+    assert [r[0] for r in results] == [candidates[4], candidates[3], candidates[0]]
+    for r, entry in zip(results, report):
+        assert r[:5] == full[r[0]][:5]
+        np.testing.assert_allclose(r[5], full[r[0]][5])
+        np.testing.assert_allclose(entry['error'], entry['estimate'] - entry['actual'])
+
+
+def bruteForceKnapsack(W, weights, values, groups):
+    """Best value over every choice of at most one item per group"""
+    options = [[None] + [i for i, g in enumerate(groups) if g == group] for group in sorted(set(groups))]
+    best, best_sol = 0.0, []
+    for choice in itertools.product(*options):
+        sol = [i for i in choice if i is not None]
+        if sum(weights[i] for i in sol) <= W + 1e-9 and sum(values[i] for i in sol) > best:
+            best, best_sol = sum(values[i] for i in sol), sorted(sol)
+    return best, best_sol
+
+
+def test_knapsack_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        n = rng.integers(3, 9)
+        weights = [int(w) for w in rng.integers(1, 10, n)]
+        values = [float(v) for v in rng.uniform(-2, 10, n)]
+        groups = [int(g) for g in rng.integers(0, 3, n)]
+        W = int(rng.integers(5, 20))
+        value, sol = multipleChoiceKnapsack(W, weights, values, groups)
+        expected, _ = bruteForceKnapsack(W, weights, values, groups)
+        np.testing.assert_allclose(value, expected)
+        np.testing.assert_allclose(sum(values[i] for i in sol), value)
+        assert sum(weights[i] for i in sol) <= W
+        assert len({groups[i] for i in sol}) == len(sol)
+
+
+def test_knapsack_scales_non_integer_weights():
+    weights = [1.25, 2.5, 0.75, 1.5]
+    values = [3.0, 5.0, 1.5, 3.5]
+    groups = [0, 0, 1, 1]
+    # Without scale the weights round up to 2, 3, 1 and 2 and the best pair no longer fits
+    value, sol = multipleChoiceKnapsack(4, weights, values, groups, scale=4)
+    assert sol == [1, 3]
+    np.testing.assert_allclose(value, bruteForceKnapsack(4, weights, values, groups)[0])
+    value, sol = multipleChoiceKnapsack(4, weights, values, groups)
+    assert sum(weights[i] for i in sol) <= 4 and value < 8.5
@@ -0,0 +1,116 @@
+import numpy as np
+import gurobipy as gp
+from Model_Build import getSolution, optimizeModel
+
+
+def smallModel():
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    x = model.addVars(3, lb=-10)
+    constraints = model.addConstrs(x[i] == -5 for i in range(3))
+    model.setObjective(x.sum())
+    return model, x, constraints
+
+
+def test_solution_cache_refreshes_after_direct_optimize():
+    model, x, constraints = smallModel()
+    optimizeModel(model)
+    np.testing.assert_array_equal(getSolution(model).X, [-5, -5, -5])
+    model.setAttr('RHS', list(constraints.values()), [-7] * 3)
+    model.optimize()
+    np.testing.assert_array_equal(getSolution(model).X, [-7, -7, -7])
+    np.testing.assert_array_equal(getSolution(model).Pi, [1, 1, 1])
+
+
+def test_solution_cache_is_reused_without_new_solve():
+    model, x, constraints = smallModel()
+    optimizeModel(model)
+    assert getSolution(model).X is getSolution(model).X
+
+
+def buildSystem(model, T):
+    from Devices import Generator, ExternalPower, FixedLoadTest
+    from Networks import Network
+    generator = Generator(T, model, power_max=2, power_min=0, ramp_min=-1, ramp_max=1, operating_point=1, alpha=1, beta=10, gamma=1)
+    external = ExternalPower(T, model, 60)
+    load = FixedLoadTest(T, model, power=list(np.linspace(1, 3, len(T))))
+    return Network(T, model, [generator.Econnections[0], external.Econnections[0], load.Econnections[0]])
+
+
+def test_objective_is_assembled_once_before_optimize():
+    from Model_Build import getObjectiveRegistry
+    T = list(range(6))
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    buildSystem(model, T)
+    registry = getObjectiveRegistry(model)
+    assert registry.assembled == 0
+    optimizeModel(model)
+    assert registry.assembled == 1
+    assembled = model.ObjVal
+    assert assembled != 0
+    model.optimize()
+    assert model.ObjVal == assembled
+
+
+def test_dropped_terms_are_removed_not_negated():
+    from Model_Build import getObjectiveRegistry
+    T = list(range(6))
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    buildSystem(model, T)
+    registry = getObjectiveRegistry(model)
+    size = registry.assemble().size()
+    device, expr = next(iter(registry.terms.items()))
+    for _ in range(3):
+        registry.drop(device)
+        registry.assemble()
+        registry.register(device, expr)
+        registry.assemble()
+    assert registry.assemble().size() == size
+    optimizeModel(model)
+    reference = gp.Model()
+    reference.setParam('OutputFlag', 0)
+    buildSystem(reference, T)
+    optimizeModel(reference)
+    assert np.isclose(model.ObjVal, reference.ObjVal)
+
+
+def test_system_builder_defers_objective():
+    from Model_Build import SystemBuilder, getObjectiveRegistry
+    T = list(range(6))
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    with SystemBuilder(model):
+        buildSystem(model, T)
+        assert getObjectiveRegistry(model).dirty
+    assert not getObjectiveRegistry(model).dirty
+    assert getObjectiveRegistry(model).assembled == 1
+
+
+def test_compare_build_prints_only_when_verbose(capsys):
+    from Model_Build import compareBuild
+
+    def factory():
+        model = gp.Model()
+        model.setParam('OutputFlag', 0)
+        return model
+
+    report = compareBuild(lambda model: buildSystem(model, list(range(6))), factory)
+    assert 'deferred' not in capsys.readouterr().out
+    assert report['suppressed_updates'] > 0
+    compareBuild(lambda model: buildSystem(model, list(range(6))), factory, verbose=True)
+    assert 'deferred' in capsys.readouterr().out
+
+
+def test_dual_values_follow_constraints_removed_from_other_network():
+    T = list(range(6))
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    first = buildSystem(model, T)
+    second = buildSystem(model, T)
+    optimizeModel(model)
+    np.testing.assert_array_equal(second.dualValues, [c.Pi for c in second.constraints])
+    first.deleteConstraints()
+    optimizeModel(model)
+    np.testing.assert_array_equal(second.dualValues, [c.Pi for c in second.constraints])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import gurobipy as gp
+from Model_Build import optimizeModel, getObjectiveRegistry
+from Snapshot import saveSnapshot, loadSnapshot
+from Investment_Heuristics import attachCandidate, detachCandidate
+
+
+def buildSystem(model, T):
+    from Devices import Generator, ExternalPower, FixedLoadTest, TransmissionLine
+    from Networks import Network
+    from Devices_Heuristic import HeuristicStorage
+    investments = {'Storage': {3: 15}}
+    generator = Generator(T, model, power_max=3, power_min=0, ramp_min=-1, ramp_max=1, operating_point=1, alpha=1, beta=10, gamma=1)
+    external = ExternalPower(T, model, 60)
+    load = FixedLoadTest(T, model, power=list(np.linspace(0.5, 2.5, len(T))))
+    line = TransmissionLine(T, model, power_max=1, alpha=0.25)
+    storage = HeuristicStorage(T, model, 1, investments, discharge_max=1, charge_max=1, energy_max=3)
+    nets = [Network(T, model, [generator.Econnections[0], line.Econnections[0]]),
+            Network(T, model, [load.Econnections[0], external.Econnections[0], line.Econnections[1], storage.Econnections[0]])]
+    detachCandidate(storage, nets)
+    return [generator, external, load, line, storage], nets
+
+
+def solve(model, nets):
+    optimizeModel(model)
+    return model.ObjVal, [np.array(net.dualValues) for net in nets]
+
+
+@pytest.mark.parametrize('matrix_api', [False, True])
+def test_snapshot_round_trip(tmp_path, matrix_api):
+    from Devices import useMatrixAPI
+    model = gp.Model()
+    model.setParam('OutputFlag', 0)
+    useMatrixAPI(model, matrix_api)
+    devices, nets = buildSystem(model, list(range(6)))
+    objective, duals = solve(model, nets)
+    saveSnapshot(str(tmp_path / 'system'), model, devices, nets)
+
+    loaded, loaded_devices, loaded_nets = loadSnapshot(str(tmp_path / 'system'))
+    loaded.setParam('OutputFlag', 0)
+    assert len(getObjectiveRegistry(loaded).terms) == len(getObjectiveRegistry(model).terms)
+    loaded_objective, loaded_duals = solve(loaded, loaded_nets)
+    assert np.isclose(loaded_objective, objective)
+    for a, b in zip(loaded_duals, duals):
+        np.testing.assert_allclose(a, b, atol=1e-6)
+
+    # Registering a cost again replaces it instead of counting it twice
+    loaded_devices[0]._updateObjective()
+    assert np.isclose(solve(loaded, loaded_nets)[0], objective)
+
+    # Candidates attach and detach on the loaded system as on the original one
+    attachCandidate(devices[-1], nets)
+    attachCandidate(loaded_devices[-1], loaded_nets)
+    attached = solve(model, nets)[0]
+    assert attached < objective
+    assert np.isclose(solve(loaded, loaded_nets)[0], attached)
+    detachCandidate(loaded_devices[-1], loaded_nets)
+    assert np.isclose(solve(loaded, loaded_nets)[0], objective)
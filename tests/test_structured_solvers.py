@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from Device_ADMM import Generator, Storage, useMatrixAPI
+from Structured_Solvers import solveBandedQP, checkAgainstGurobi
+
+T = list(range(24))
+RHOS = [0.1, 1, 10]
+# Largest difference in power to the Gurobi solve, Gurobi itself stops at its barrier tolerance
+TOLERANCE = 1e-4
+
+GENERATORS = {
+    'no ramps': dict(power_min=0, power_max=10, operating_point=3, alpha=1, beta=40, gamma=1),
+    'ramps': dict(power_min=0, power_max=10, ramp_min=-1, ramp_max=1, operating_point=3, alpha=1, beta=40, gamma=1),
+    'ramps and power_init': dict(power_min=0, power_max=10, ramp_min=-1, ramp_max=1, power_init=2, operating_point=3, alpha=1, beta=40, gamma=1),
+    'linear cost': dict(power_min=0, power_max=10, ramp_min=-1, ramp_max=1, operating_point=0, alpha=0, beta=40, gamma=0),
+}
+
+STORAGES = {
+    'free final energy': dict(discharge_max=1, charge_max=1, energy_init=1, energy_max=3),
+}
+
+
+@pytest.fixture(params=[False, True], ids=['expressions', 'matrix API'])
+def matrixAPI(request):
+    return request.param
+
+
+@pytest.mark.parametrize('rho', RHOS)
+@pytest.mark.parametrize('case', GENERATORS)
+def test_generator_matches_gurobi(case, rho, matrixAPI):
+    generator = Generator(T, **GENERATORS[case])
+    useMatrixAPI([generator], matrixAPI)
+    generator.rho = rho
+    assert checkAgainstGurobi(generator, trials=5) < TOLERANCE
+
+
+@pytest.mark.parametrize('rho', RHOS)
+@pytest.mark.parametrize('case', STORAGES)
+def test_storage_matches_gurobi(case, rho, matrixAPI):
+    storage = Storage(T, **STORAGES[case])
+    useMatrixAPI([storage], matrixAPI)
+    storage.rho = rho
+    assert checkAgainstGurobi(storage, trials=5) < TOLERANCE
+
+
+def test_generator_keeps_power_init_and_ramps():
+    generator = Generator(T, **GENERATORS['ramps and power_init'])
+    generator.Econnections[0]._penalty_term = np.random.default_rng(1).normal(0, 10, len(T))
+    power = generator.structuredUpdate()[0]
+    assert power[0] == -2
+    assert np.all(np.abs(np.diff(power)) <= 1 + 1e-6)
+
+
+def test_storage_ignores_energy_final_like_devices():
+    # Storage in Devices.py does not constrain the final energy either
+    penalty = np.random.default_rng(1).normal(0, 10, len(T))
+    powers = []
+    for energy_final in (None, 2):
+        storage = Storage(T, energy_final=energy_final, **STORAGES['free final energy'])
+        storage.Econnections[0]._penalty_term = penalty
+        powers.append(storage.structuredUpdate()[0])
+    np.testing.assert_array_equal(powers[0], powers[1])
+    energy = 1 + np.cumsum(powers[1])
+    assert np.all(energy >= -1e-6) and np.all(energy <= 3 + 1e-6)
+    assert storage.model.NumConstrs == Storage(T, **STORAGES['free final energy']).model.NumConstrs
+
+
+def test_unconstrained_problem_is_a_linear_solve():
+    rng = np.random.default_rng(0)
+    n = 10
+    diagonal, off_diagonal, c = rng.uniform(3, 4, n), rng.uniform(-1, 1, n - 1), rng.normal(size=n)
+    H = np.diag(diagonal) + np.diag(off_diagonal, 1) + np.diag(off_diagonal, -1)
+    infinite = np.full(n, np.inf)
+    y = solveBandedQP(diagonal, off_diagonal, c, -infinite, infinite, -infinite[1:], infinite[1:])
+    np.testing.assert_allclose(y, np.linalg.solve(H, -c), atol=1e-9)
+
+
+def test_infeasible_problem_raises():
+    n = 5
+    with pytest.raises(RuntimeError):
+        solveBandedQP(np.ones(n), np.zeros(n - 1), np.zeros(n), np.zeros(n), np.ones(n), np.full(n - 1, 2.0), np.full(n - 1, 3.0))
+
+
+def test_matrix_api_is_selected_per_device():
+    expressions, matrix = Storage(T, **STORAGES['free final energy']), Storage(T, **STORAGES['free final energy'])
+    useMatrixAPI([matrix])
+    assert (expressions.matrixAPI, matrix.matrixAPI, Storage.matrixAPI) == (False, True, False)
+    expressions.model.update()
+    assert matrix.model.NumConstrs == expressions.model.NumConstrs
+    penalty = np.random.default_rng(2).normal(0, 10, len(T))
+    powers = []
+    for storage in (expressions, matrix):
+        storage.Econnections[0]._penalty_term = penalty
+        storage._updateObjective()
+        storage.model.optimize()
+        powers.append(np.array([v.X for v in storage.Econnections[0].powerVariables.values()]))
+    np.testing.assert_allclose(powers[0], powers[1], atol=1e-5)